@@ -0,0 +1,244 @@
+"""全部转换路径的基准测试
+
+生成合成的源文件（64/1024/4096 像素的 RGBA、RGB、P 模式位图，不同复杂度的 SVG，ICNS），
+对每个源分别计时 convert_to_ico、convert_to_icns、convert_to_png、convert_to_favicon、
+convert_to_svg（PNG、JPEG、WebP 三种嵌入编码）以及 svg_to_png，报告吞吐量、p50/p95 延迟和峰值内存（RSS）。
+
+每个用例在独立的子进程中运行，峰值内存互不影响；每次转换前清空 SVG 栅格化缓存，测的是冷启动的耗时。
+结果可以保存为 JSON 基线，之后用 --compare 对比，p50 延迟或峰值内存超出容差时以非零状态退出。
+
+用法：
+    python benchmarks/bench_conversions.py [--quick] [--repeat 5] [--filter ico]
+    python benchmarks/bench_conversions.py --save benchmarks/baselines/main.json
+    python benchmarks/bench_conversions.py --compare benchmarks/baselines/main.json [--tolerance 0.2]
+"""
+import os
+import sys
+import json
+import time
+import functools
+import platform
+import argparse
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw
+
+from icon_converter import engine
+
+RASTER_SIZES = [64, 1024, 4096]
+RASTER_MODES = ['RGBA', 'RGB', 'P']
+# SVG 复杂度：图形数量
+SVG_SHAPES = {"simple": 4, "complex": 400}
+
+CONVERTERS = {
+    "ico": engine.convert_to_ico,
+    "icns": engine.convert_to_icns,
+    "png": engine.convert_to_png,
+    "favicon": engine.convert_to_favicon,
+    "svg": engine.convert_to_svg,
+    "svg_jpeg": functools.partial(engine.convert_to_svg, codec="jpeg"),
+    "svg_webp": functools.partial(engine.convert_to_svg, codec="webp"),
+}
+
+
+def make_raster(size, mode):
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    step = max(1, size // 16)
+    for i in range(0, size, step):
+        draw.ellipse((i // 2, i // 2, size - i // 2, size - i // 2),
+                     outline=(i % 256, 128, 255 - i % 256, 255), width=max(1, step // 4))
+    if mode == 'RGB':
+        return img.convert('RGB')
+    if mode == 'P':
+        return img.quantize(256)
+    return img
+
+
+def make_svg(shapes):
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="256" height="256" viewBox="0 0 256 256">',
+             '<defs><linearGradient id="g" x1="0" y1="0" x2="1" y2="1">'
+             '<stop offset="0" stop-color="#36c"/><stop offset="1" stop-color="#f90"/>'
+             '</linearGradient></defs>',
+             '<rect width="256" height="256" rx="48" fill="url(#g)"/>']
+    for i in range(shapes):
+        x, y = (i * 37) % 256, (i * 91) % 256
+        parts.append(f'<path d="M{x} {y} q 20 -40 40 0 t 40 0" fill="none" '
+                     f'stroke="#{(i * 2654435761) % 0xffffff:06x}" stroke-width="3" opacity="0.7"/>')
+    parts.append('</svg>')
+    return "\n".join(parts).encode('utf-8')
+
+
+def make_sources(folder, quick=False):
+    """生成全部合成源文件，返回 {源名称: 路径}"""
+    sources = {}
+    sizes = RASTER_SIZES[:2] if quick else RASTER_SIZES
+    for size in sizes:
+        for mode in RASTER_MODES:
+            path = os.path.join(folder, f"raster_{size}_{mode}.png")
+            make_raster(size, mode).save(path)
+            sources[f"png{size}-{mode}"] = path
+    for name, shapes in SVG_SHAPES.items():
+        path = os.path.join(folder, f"vector_{name}.svg")
+        with open(path, 'wb') as f:
+            f.write(make_svg(shapes))
+        sources[f"svg-{name}"] = path
+    # ICNS 源由引擎从 1024 像素的位图生成，这个位图本身不作为用例
+    master = os.path.join(folder, "icns_master.png")
+    make_raster(1024, 'RGBA').save(master)
+    sources["icns"] = engine.convert_to_icns(master, folder, "icon")
+    return sources
+
+
+def make_cases(sources, only=None):
+    """返回 [(用例名称, 源路径, 转换名称)]"""
+    cases = []
+    for source_name, path in sources.items():
+        names = list(CONVERTERS)
+        if engine.is_svg(path):
+            names.append("svg_to_png")
+        for name in names:
+            case = f"{source_name}/{name}"
+            if only and not any(f in case for f in only):
+                continue
+            cases.append((case, path, name))
+    return cases
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(path, name, repeat, warmup, connection):
+    """在子进程中执行一个用例，通过管道返回每次转换的耗时和峰值内存"""
+    from icon_converter.svg import raster_cache
+
+    timings = []
+    with tempfile.TemporaryDirectory() as output_folder:
+        for i in range(warmup + repeat):
+            raster_cache.clear()
+            start = time.perf_counter()
+            if name == "svg_to_png":
+                engine.svg_to_png(path, os.path.join(output_folder, "out.png"))
+            else:
+                CONVERTERS[name](path, output_folder, "out")
+            if i >= warmup:
+                timings.append(time.perf_counter() - start)
+    connection.send({"timings": timings, "peak_rss_mb": peak_rss_mb()})
+    connection.close()
+
+
+def measure(path, name, repeat, warmup):
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_case, args=(path, name, repeat, warmup, sender))
+    process.start()
+    sender.close()
+    try:
+        data = receiver.recv()
+    except EOFError:
+        data = None
+    process.join()
+    if data is None:
+        raise RuntimeError(f"子进程异常退出（退出码 {process.exitcode}）")
+
+    timings = data["timings"]
+    mean = sum(timings) / len(timings)
+    return {
+        "runs": len(timings),
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "throughput_per_s": 1 / mean if mean else None,
+        "peak_rss_mb": data["peak_rss_mb"],
+    }
+
+
+def environment():
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """返回超出容差的回归列表"""
+    regressions = []
+    for case, current in results.items():
+        previous = baseline.get("results", {}).get(case)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "peak_rss_mb"):
+            old, new = previous.get(metric), current.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{case} {metric}: {old:.1f} -> {new:.1f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例计时的次数")
+    parser.add_argument("--warmup", type=int, default=1, help="计时前的预热次数")
+    parser.add_argument("--quick", action="store_true", help="跳过 4096 像素的源")
+    parser.add_argument("--filter", nargs='+', help="只运行名称包含任一关键字的用例")
+    parser.add_argument("--save", metavar="JSON", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="JSON", help="与基线对比，出现回归时以状态 1 退出")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="允许的相对增幅，默认 0.2（20%%）")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        cases = make_cases(make_sources(folder, args.quick), args.filter)
+        print(f"{'用例':<28} {'p50(ms)':>10} {'p95(ms)':>10} {'次/秒':>8} {'峰值RSS(MB)':>12}")
+        for case, path, name in cases:
+            result = measure(path, name, args.repeat, args.warmup)
+            results[case] = result
+            rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else "-"
+            print(f"{case:<28} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+                  f"{result['throughput_per_s']:>8.2f} {rss:>12}")
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"基线已保存: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != report["environment"]:
+            print("注意: 基线来自不同的运行环境，对比结果仅供参考")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"发现 {len(regressions)} 项回归（容差 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"与基线相比没有超出 {args.tolerance:.0%} 的回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
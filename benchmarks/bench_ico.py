@@ -0,0 +1,120 @@
+"""ICO 编码体积的基准测试
+
+对合成的源图（扁平图标、抗锯齿图标、像素画、照片、半透明纯色）按 ICO 和 Favicon 的尺寸生成 ICO，
+比较 ico 模块的输出与 PIL 默认编码（每个尺寸都是 32 位 PNG）的文件大小，并列出每个尺寸选择的编码。
+同时检查用 PIL 读回的每个尺寸与编码前的像素一致（全透明像素不比较颜色），不一致时退出码为 1。
+
+用法：
+    python benchmarks/bench_ico.py [--frames] [--optimize]
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageChops, ImageDraw
+
+from icon_converter import engine
+from icon_converter.ico import build_ico
+
+from bench_trace import STYLES
+
+
+def make_pixel_art(size):
+    """8 种颜色、完全不透明或完全透明的像素画，放大到 size"""
+    random.seed(1)
+    colors = [(0, 0, 0, 0)] + [(random.randrange(256), random.randrange(256), random.randrange(256), 255)
+                               for _ in range(7)]
+    small = Image.new('RGBA', (16, 16))
+    small.putdata([random.choice(colors) for _ in range(256)])
+    return small.resize((size, size), Image.NEAREST)
+
+
+def make_photo(size):
+    img = Image.radial_gradient('L').resize((size, size))
+    noise = Image.effect_noise((size, size), 40)
+    return Image.merge('RGB', (img, noise, Image.linear_gradient('L').resize((size, size))))
+
+
+def make_translucent(size):
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(img).ellipse((0, 0, size - 1, size - 1), fill=(10, 200, 30, 128))
+    return img
+
+
+SOURCES = {
+    "flat": STYLES["flat"],
+    "aa": STYLES["aa"],
+    "pixel-art": make_pixel_art,
+    "photo": make_photo,
+    "translucent": make_translucent,
+}
+
+SIZE_SETS = {"ico": engine.ICO_SIZES, "favicon": engine.FAVICON_SIZES}
+
+
+def pil_size(frames):
+    """PIL 默认编码的 ICO 文件大小"""
+    buffer = io.BytesIO()
+    largest = frames[-1]
+    largest.save(buffer, format='ICO', sizes=[frame.size for frame in frames], append_images=frames[:-1])
+    return buffer.getbuffer().nbytes
+
+
+def visible(img):
+    """转换为 RGBA，全透明的像素统一为 (0, 0, 0, 0)；BMP 编码把这些像素的颜色写为黑色"""
+    img = img.convert('RGBA')
+    return Image.composite(img, Image.new('RGBA', img.size), img.getchannel('A').point(lambda a: 255 if a else 0))
+
+
+def round_trip(data, frames):
+    """用 PIL 读回 ICO 的各尺寸，返回与编码前像素不同的尺寸"""
+    ico = Image.open(io.BytesIO(data))
+    different = []
+    for frame in frames:
+        ico.size = frame.size
+        ico.load()
+        if ImageChops.difference(visible(ico), visible(frame)).getbbox(alpha_only=False) is not None:
+            different.append(frame.size)
+    return different
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", action="store_true", help="列出每个尺寸选择的编码")
+    parser.add_argument("--optimize", action="store_true", help="PNG 编码的尺寸经过体积优化（见 pngopt 模块）")
+    args = parser.parse_args(argv)
+
+    print(f"{'源':<14} {'尺寸组':<8} {'PIL':>9} {'优化后':>9} {'节省':>7} {'耗时':>10}")
+    total_pil = total = 0
+    failures = []
+    for name, make in SOURCES.items():
+        source = make(256)
+        for set_name, sizes in SIZE_SETS.items():
+            frames = [source.resize(size, Image.LANCZOS) for size in sizes]
+            baseline = pil_size(frames)
+            start = time.perf_counter()
+            data, report = build_ico(frames, args.optimize)
+            elapsed = (time.perf_counter() - start) * 1000
+            total_pil += baseline
+            total += len(data)
+            for size in round_trip(data, frames):
+                failures.append(f"{name} {set_name} {size[0]}px 读回的像素与编码前不同")
+            print(f"{name:<14} {set_name:<8} {baseline:>9} {len(data):>9} {1 - len(data) / baseline:>6.0%} "
+                  f"{elapsed:>7.1f} ms")
+            if args.frames:
+                for frame in report.frames:
+                    print(f"    {frame.size[0]:>3}px  {frame.format:<4} {frame.bits:>2} 位 {frame.bytes:>8}")
+    print(f"{'合计':<23} {total_pil:>9} {total:>9} {1 - total / total_pil:>6.0%}")
+    for line in failures:
+        print(f"失败: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
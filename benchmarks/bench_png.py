@@ -0,0 +1,83 @@
+"""PNG 体积优化的基准测试
+
+对合成的源图（扁平图标、抗锯齿图标、像素画、照片、灰度照片、半透明纯色、带透明度的灰度字形）比较
+PIL 默认设置、PIL 的 optimize=True 和 pngopt.optimize_png 的文件大小与耗时，并列出胜出的编码方式。
+每张图的优化结果解码后、以及 to_palette 的调色板结果都与原图逐像素比较，必须是无损的，否则以状态 1 退出。
+
+用法：
+    python benchmarks/bench_png.py [--size 512] [--repeat 3]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageChops
+
+from icon_converter.pngopt import encode_png, optimize_png, to_palette
+
+from bench_ico import SOURCES
+
+SOURCES = dict(SOURCES, gray=lambda size: SOURCES["photo"](size).convert('L'),
+               glyph=lambda size: SOURCES["aa"](size).convert('LA'))
+
+
+def same_pixels(img, original):
+    return ImageChops.difference(img.convert('RGBA'), original.convert('RGBA')).getbbox(alpha_only=False) is None
+
+
+def palette_round_trip(img):
+    """to_palette 的结果按调色板项还原为 RGBA，颜色超过 256 种时返回 None"""
+    palette = to_palette(img)
+    if palette is None:
+        return None
+    indexed, entries = palette
+    indexed = indexed.copy()
+    indexed.putpalette([channel for color in entries for channel in color], 'RGBA')
+    return indexed.convert('RGBA')
+
+
+def best_time(function, repeat):
+    """多次运行，返回 (最短耗时（毫秒）, 最后一次的结果)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=512, help="源图边长，默认 512")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的次数，取最短耗时")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'源':<12} {'PIL':>9} {'optimize':>9} {'优化后':>9} {'节省':>6} {'PIL 耗时':>10} {'优化耗时':>10}  编码方式")
+    for name, make in SOURCES.items():
+        img = make(args.size)
+        base_ms, baseline = best_time(lambda: encode_png(img), args.repeat)
+        pil_optimized = encode_png(img, optimize=True)
+        ms, (data, report) = best_time(lambda: optimize_png(img), args.repeat)
+        print(f"{name:<12} {len(baseline):>9} {len(pil_optimized):>9} {len(data):>9} "
+              f"{1 - len(data) / len(baseline):>5.0%} {base_ms:>7.1f} ms {ms:>7.1f} ms  {report.method}")
+
+        if not same_pixels(Image.open(io.BytesIO(data)), img):
+            failures.append(f"{name} 优化后的像素与原图不同")
+        restored = palette_round_trip(img)
+        if restored is not None and not same_pixels(restored, img):
+            failures.append(f"{name} to_palette 的结果与原图不同")
+
+    for line in failures:
+        print(f"失败: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""尺寸金字塔基准测试
+
+对比「每个尺寸都从原图缩放」与「链式缩放」生成 ICO/ICNS/Favicon 全部尺寸的耗时。
+
+用法：
+    python benchmarks/bench_pyramid.py [--source-size 4096] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from icon_converter import engine
+from icon_converter.pyramid import SizePyramid
+
+# ICO、ICNS、Favicon 各路径需要的全部尺寸
+ALL_SIZES = sorted(
+    set(engine.ICO_SIZES) | set(engine.FAVICON_SIZES) | {engine.FAVICON_PNG_SIZE}
+    | {(size, size) for size in engine.ICNS_SIZES},
+    reverse=True,
+)
+
+
+def make_source(size):
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    step = max(1, size // 16)
+    for i in range(0, size, step):
+        draw.ellipse((i // 2, i // 2, size - i // 2, size - i // 2),
+                     outline=(i % 256, 128, 255 - i % 256, 255), width=max(1, step // 4))
+    return img
+
+
+def resize_independently(img):
+    return [img.resize(size, Image.LANCZOS) for size in ALL_SIZES]
+
+
+def resize_with_pyramid(img):
+    return SizePyramid(img).build(ALL_SIZES)
+
+
+def best_of(func, img, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(img)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source-size", type=int, nargs='+', default=[1024, 2048, 4096])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"尺寸: {', '.join(str(s[0]) for s in ALL_SIZES)}")
+    print(f"{'源尺寸':>8} {'独立缩放(s)':>12} {'链式缩放(s)':>12} {'加速比':>8}")
+    for source_size in args.source_size:
+        img = make_source(source_size)
+        baseline = best_of(resize_independently, img, args.repeat)
+        chained = best_of(resize_with_pyramid, img, args.repeat)
+        print(f"{source_size:>8} {baseline:>12.4f} {chained:>12.4f} {baseline / chained:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
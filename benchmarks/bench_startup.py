@@ -0,0 +1,139 @@
+"""启动开销基准测试
+
+短时间运行的单文件任务中，启动耗时往往超过转换本身。这里测量：
+
+    help     python -m icon_converter --help 的耗时，扣除空解释器的启动时间
+    convert  python -m icon_converter convert 转换一个 16 像素 PNG 的总耗时
+    worker   新建进程池（默认 spawn，与 macOS、Windows 相同）到第一个文件转换完成的耗时，
+             以及同一工作进程中第二个文件的耗时（两者之差即工作进程的启动开销）
+
+并检查解析命令行参数时没有导入 PIL、Qt、asyncio 等重量级模块，工作进程中没有导入 Qt。
+超出预算或导入了不该导入的模块时以状态 1 退出。
+
+用法：
+    python benchmarks/bench_startup.py [--repeat 7] [--help-budget 100] [--worker-budget 600]
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 只解析参数时不应导入的模块
+CLI_FORBIDDEN = ("PIL", "PyQt5", "asyncio", "multiprocessing", "icon_converter.engine")
+# 工作进程中不应导入的模块
+WORKER_FORBIDDEN = ("PyQt5",)
+
+# 注意：spawn 模式下工作进程会重新导入本文件，模块顶层不能导入 PIL 或 icon_converter
+
+
+def _loaded(names):
+    """在（子）进程中返回 names 中已导入的模块"""
+    return [name for name in names if name in sys.modules]
+
+
+def _environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def time_command(args, repeat):
+    """多次运行命令，返回最短耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, check=True,
+                       env=_environment(), cwd=ROOT)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def cli_modules():
+    """解析命令行参数后已导入的重量级模块"""
+    code = ("import sys, json; from icon_converter import cli; cli.build_parser();"
+            f"print(json.dumps([m for m in {CLI_FORBIDDEN!r} if m in sys.modules]))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            env=_environment(), cwd=ROOT).stdout
+    return json.loads(output)
+
+
+def measure_worker(context, source, output_folder):
+    """返回 (第一个文件的耗时, 第二个文件的耗时, 工作进程中已导入的禁用模块)"""
+    from icon_converter import batch
+
+    cancel = batch.engine.CancelToken(multiprocessing.get_context(context).Event())
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context(context),
+                             initializer=batch._init_worker, initargs=(cancel.event,)) as executor:
+        result = executor.submit(batch.convert_file, source, ["ico"], output_folder).result()
+        first = time.perf_counter() - start
+        if result.errors:
+            raise RuntimeError(f"转换失败: {result.errors}")
+        start = time.perf_counter()
+        executor.submit(batch.convert_file, source, ["ico"], output_folder).result()
+        second = time.perf_counter() - start
+        loaded = executor.submit(_loaded, WORKER_FORBIDDEN).result()
+    return first, second, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7, help="每项测量的次数，取最短耗时")
+    parser.add_argument("--context", default="spawn", choices=multiprocessing.get_all_start_methods(),
+                        help="工作进程的启动方式，默认 spawn")
+    parser.add_argument("--help-budget", type=float, default=100, metavar="MS",
+                        help="--help 扣除空解释器后的耗时预算（毫秒），默认 100")
+    parser.add_argument("--worker-budget", type=float, default=600, metavar="MS",
+                        help="新建工作进程并转换第一个文件的耗时预算（毫秒），默认 600")
+    args = parser.parse_args(argv)
+
+    from PIL import Image
+
+    failures = []
+    bare = time_command(["-c", "pass"], args.repeat)
+    help_time = time_command(["-m", "icon_converter", "--help"], args.repeat)
+    overhead = (help_time - bare) * 1000
+    print(f"{'空解释器':<24} {bare * 1000:>8.1f} ms")
+    print(f"{'--help':<24} {help_time * 1000:>8.1f} ms（启动开销 {overhead:.1f} ms，预算 {args.help_budget:.0f} ms）")
+    if overhead > args.help_budget:
+        failures.append(f"--help 启动开销 {overhead:.1f} ms 超出预算 {args.help_budget:.0f} ms")
+
+    loaded = cli_modules()
+    if loaded:
+        failures.append(f"解析参数时导入了: {', '.join(loaded)}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "icon.png")
+        Image.new('RGBA', (16, 16), (51, 102, 204, 255)).save(source)
+        output_folder = os.path.join(folder, "out")
+
+        convert_time = time_command(["-m", "icon_converter", "convert", "--to", "ico", "-j", "1", "-q",
+                                     source, output_folder], args.repeat)
+        print(f"{'convert（单个文件）':<24} {convert_time * 1000:>8.1f} ms")
+
+        runs = [measure_worker(args.context, source, output_folder) for _ in range(args.repeat)]
+        first = min(r[0] for r in runs) * 1000
+        second = min(r[1] for r in runs) * 1000
+        print(f"{'worker 首个文件':<24} {first:>8.1f} ms（{args.context}，预算 {args.worker_budget:.0f} ms）")
+        print(f"{'worker 后续文件':<24} {second:>8.1f} ms（启动开销 {first - second:.1f} ms）")
+        if first > args.worker_budget:
+            failures.append(f"工作进程首个文件 {first:.1f} ms 超出预算 {args.worker_budget:.0f} ms")
+        loaded = sorted({name for r in runs for name in r[2]})
+        if loaded:
+            failures.append(f"工作进程中导入了: {', '.join(loaded)}")
+
+    for line in failures:
+        print(f"失败: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""位图描摹的基准测试
+
+生成合成的扁平风格图标（圆角矩形、圆、三角形和斜线），分为没有抗锯齿（flat）和
+4 倍超采样缩小得到的抗锯齿（aa）两种，在 64/128/256/512 像素下按各细节级别描摹，
+报告耗时（多次运行取最短）、SVG 体积、与嵌入 PNG 的 SVG 体积之比以及子路径数量。
+
+256 像素的任意一项描摹超出预算时以状态 1 退出。
+
+用法：
+    python benchmarks/bench_trace.py [--repeat 5] [--budget 500]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw
+
+from icon_converter import trace
+
+SIZES = [64, 128, 256, 512]
+# 检查预算的尺寸
+BUDGET_SIZE = 256
+
+
+def make_icon(size):
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    s = size / 256
+    draw.rounded_rectangle((8 * s, 8 * s, 248 * s, 248 * s), radius=48 * s, fill=(51, 102, 204, 255))
+    draw.ellipse((60 * s, 60 * s, 196 * s, 196 * s), fill=(255, 255, 255, 255))
+    draw.ellipse((100 * s, 100 * s, 156 * s, 156 * s), fill=(255, 153, 0, 255))
+    draw.polygon([(128 * s, 20 * s), (150 * s, 60 * s), (106 * s, 60 * s)], fill=(220, 40, 40, 255))
+    draw.line((20 * s, 230 * s, 230 * s, 150 * s), fill=(20, 20, 20, 255), width=max(1, int(6 * s)))
+    return img
+
+
+STYLES = {
+    "flat": make_icon,
+    "aa": lambda size: make_icon(size * 4).resize((size, size), Image.LANCZOS),
+}
+
+
+def embedded_size(img):
+    """嵌入 PNG 的 SVG 包装的大约体积（base64 编码后）"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return (len(buffer.getvalue()) + 2) // 3 * 4
+
+
+def measure(img, detail, repeat):
+    """返回 (最短耗时（秒）, SVG 文档)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        document = trace.trace_image(img, detail)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, document
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的次数，取最短耗时")
+    parser.add_argument("--budget", type=float, default=500, metavar="MS",
+                        help=f"{BUDGET_SIZE} 像素图标描摹的耗时预算（毫秒），默认 500")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'用例':<18} {'细节':<8} {'耗时':>10} {'SVG':>10} {'嵌入 PNG':>10} {'比例':>7} {'子路径':>7}")
+    for style, make in STYLES.items():
+        for size in SIZES:
+            img = make(size)
+            embedded = embedded_size(img)
+            for detail in trace.DETAIL_LEVELS:
+                seconds, document = measure(img, detail, args.repeat)
+                ms = seconds * 1000
+                print(f"{f'{style} {size}px':<18} {detail:<8} {ms:>7.1f} ms {len(document):>10} "
+                      f"{embedded:>10} {len(document) / embedded:>6.0%} {document.count(b'Z'):>7}")
+                if size == BUDGET_SIZE and ms > args.budget:
+                    failures.append(f"{style} {size}px {detail} 耗时 {ms:.1f} ms 超出预算 {args.budget:.0f} ms")
+
+    for line in failures:
+        print(f"失败: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
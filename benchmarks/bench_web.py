@@ -0,0 +1,80 @@
+"""网页图标包的基准测试
+
+把合成的源图（扁平图标、照片）存为 PNG 文件，比较两种生成全套网页图标的方式：
+    单次转换  engine.convert(..., "web")，源只解码一次，各尺寸共用一个尺寸金字塔
+    分别转换  每个文件各运行一次：重新解码源文件，从原图直接缩放到目标尺寸后编码，
+              相当于对每个尺寸分别调用一次单尺寸的转换工具
+报告两者的耗时（多次运行取最短）和加速比。
+
+用法：
+    python benchmarks/bench_web.py [--size 2048] [--repeat 3]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+from icon_converter import engine, web
+from icon_converter.ico import build_ico
+
+from bench_ico import SOURCES
+
+CASES = ["aa", "photo"]
+
+
+def separate(source, output_folder, base_name):
+    """每个文件独立解码、缩放和编码"""
+    def decode():
+        return engine.load_source(source, max_size=engine.ICON_DECODE_SIZE).icon_image
+
+    frames = [decode().resize(size, Image.LANCZOS) for size in web.ICO_SIZES]
+    data, _ = build_ico(frames)
+    with open(os.path.join(output_folder, web.file_name(base_name, web.ICO_NAME)), 'wb') as f:
+        f.write(data)
+    for icon in web.ICONS:
+        img = decode().convert('RGBA').resize((icon.size, icon.size), Image.LANCZOS)
+        img.save(os.path.join(output_folder, web.file_name(base_name, icon.name)), 'PNG')
+
+
+def best_time(function, repeat):
+    """多次运行，返回最短耗时（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2048, help="源图边长，默认 2048")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的次数，取最短耗时")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_web-")
+    try:
+        print(f"{'源':<10} {'单次转换':>12} {'分别转换':>12} {'加速比':>7}")
+        for name in CASES:
+            source = os.path.join(work_dir, f"{name}.png")
+            SOURCES[name](args.size).save(source)
+            output_folder = os.path.join(work_dir, name)
+            os.makedirs(output_folder)
+            bundle_ms = best_time(lambda: engine.convert(source, "web", output_folder), args.repeat)
+            separate_ms = best_time(lambda: separate(source, output_folder, name), args.repeat)
+            print(f"{name:<10} {bundle_ms:>9.1f} ms {separate_ms:>9.1f} ms {separate_ms / bundle_ms:>6.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
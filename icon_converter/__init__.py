@@ -0,0 +1,42 @@
+"""图标格式互转工具
+
+转换逻辑位于 engine 模块，可在没有 Qt 窗口的环境中直接调用。
+包本身不导入 engine：下面的名称在首次访问时才加载，命令行的 --help 等不需要 PIL 的路径启动更快。
+"""
+import importlib
+
+__version__ = "1.0.0"
+
+# 名称 -> 所在模块
+_EXPORTS = {
+    "TARGET_FORMATS": ".formats",
+    "ConversionError": ".errors",
+    "convert": ".engine",
+    "convert_to_ico": ".engine",
+    "convert_to_icns": ".engine",
+    "convert_to_png": ".engine",
+    "convert_to_favicon": ".engine",
+    "convert_to_svg": ".engine",
+    "convert_to_web": ".engine",
+    "svg_to_png": ".engine",
+    "trace_image": ".trace",
+    "convert_many": ".engine",
+    "load_source": ".engine",
+    "SourceImage": ".engine",
+    "OutputCache": ".output_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,6 @@
+import sys
+
+from .cli import launch
+
+if __name__ == '__main__':
+    sys.exit(launch())
@@ -0,0 +1,69 @@
+"""平台后端
+
+各平台不同的部分都集中在这里：缓存目录、图形界面的默认输出目录和应用程序设置。
+转换本身（包括 ICNS 的写入）在所有平台上是同一套代码，不调用 iconutil 等平台工具，
+缓存、进程池等优化只需要实现和测量一次。
+
+本模块不导入 Qt，命令行和工作进程中也可以使用。
+"""
+import os
+import sys
+
+
+class PlatformBackend:
+    """Linux 等其他平台的后端，也是各平台后端的基类"""
+
+    name = "generic"
+
+    def cache_root(self):
+        """当前用户的缓存根目录"""
+        return os.environ.get('XDG_CACHE_HOME') or os.path.expanduser("~/.cache")
+
+    def default_output_folder(self):
+        """图形界面默认的输出文件夹：当前用户的桌面"""
+        return os.path.join(os.path.expanduser("~"), "Desktop")
+
+    def setup_application(self, app):
+        """创建 QApplication 后调用，进行平台相关的设置"""
+
+
+class WindowsBackend(PlatformBackend):
+    name = "windows"
+
+    def cache_root(self):
+        return os.environ.get('LOCALAPPDATA') or os.path.expanduser("~")
+
+    def setup_application(self, app):
+        # 使用独立的 AppUserModelID，任务栏按本程序分组，而不是归到 python.exe 下
+        try:
+            import ctypes
+            ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("icon_converter")
+        except (AttributeError, OSError):
+            pass
+
+
+class MacBackend(PlatformBackend):
+    name = "macos"
+
+    def cache_root(self):
+        return os.path.expanduser("~/Library/Caches")
+
+    def setup_application(self, app):
+        from PyQt5.QtCore import Qt
+        # Retina 屏幕上按设备像素比显示预览图，不会发虚
+        app.setAttribute(Qt.AA_UseHighDpiPixmaps)
+
+
+def get_backend(platform=None):
+    """按 sys.platform 的取值返回对应的后端，默认为当前平台"""
+    platform = platform or sys.platform
+    if platform == 'win32':
+        return WindowsBackend()
+    if platform == 'darwin':
+        return MacBackend()
+    return PlatformBackend()
+
+
+def user_cache_dir(*parts):
+    """当前用户的缓存目录（Windows 为 %LOCALAPPDATA%，macOS 为 ~/Library/Caches，其他为 XDG_CACHE_HOME）"""
+    return os.path.join(get_backend().cache_root(), "icon_converter", *parts)
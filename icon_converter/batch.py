@@ -0,0 +1,222 @@
+"""批量转换调度
+
+遍历目录树，把每个文件的转换任务分发到进程池中执行。
+同时在途的任务数量是有限的，处理大型图标库时内存占用保持平稳。
+取消标记在主进程和工作进程间共享：取消后不再提交新文件，正在转换的文件在下一个尺寸处停止。
+使用输出缓存时，各目标格式都先查缓存，全部命中的文件不会被解码。
+指定内存预算时，按每个文件估算的峰值内存控制同时转换的文件数，处理超大图片时不会耗尽内存。
+"""
+import os
+import signal
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from . import engine, metrics
+
+# 支持作为源文件的扩展名
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ico', '.icns', '.svg')
+
+# 单个源文件的转换结果：outputs 为 {目标格式: 输出路径}，errors 为 {目标格式: 错误信息}，
+# cancelled 表示该文件的转换因取消而中止，metrics 为工作进程中收集的分阶段统计记录
+FileResult = namedtuple('FileResult', ['source', 'outputs', 'errors', 'cancelled', 'metrics'],
+                        defaults=(False, None))
+
+CANCELLED_MESSAGE = "已取消"
+
+# 工作进程中的取消标记，由 _init_worker 设置
+_worker_cancel = None
+
+
+def is_source_file(path):
+    return path.lower().endswith(SOURCE_EXTENSIONS)
+
+
+def iter_jobs(source, output_folder, exclude=None):
+    """生成 (源文件, 输出文件夹) 对；源为目录时递归遍历并保持相对目录结构
+
+    exclude 为不遍历的目录，通常是输出目录：输出目录位于源目录中时，
+    上次生成的 PNG 等会被当作新的源文件，每次运行都多生成一层。
+    """
+    if os.path.isfile(source):
+        yield source, output_folder
+        return
+
+    excluded = os.path.abspath(exclude) if exclude else None
+    for root, dirs, files in os.walk(source):
+        if excluded:
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != excluded]
+        dirs.sort()
+        rel_dir = os.path.relpath(root, source)
+        target_dir = output_folder if rel_dir == os.curdir else os.path.join(output_folder, rel_dir)
+        for name in sorted(files):
+            if is_source_file(name):
+                yield os.path.join(root, name), target_dir
+
+
+def make_cancel_token():
+    """创建可以在进程池中共享的取消标记"""
+    return engine.CancelToken(multiprocessing.Event())
+
+
+def _init_worker(cancel_event, collect_metrics=False):
+    global _worker_cancel
+    # Ctrl+C 由主进程统一处理，工作进程通过共享的取消事件停止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_cancel = engine.CancelToken(cancel_event)
+    # 统计记录随结果交回主进程，由主进程统一输出
+    if collect_metrics:
+        metrics.enable(collect=True)
+    else:
+        metrics.disable()
+
+
+def _cancelled_result(source, targets, outputs=None):
+    outputs = outputs or {}
+    errors = {t: CANCELLED_MESSAGE for t in targets if t not in outputs}
+    return FileResult(source, outputs, errors, cancelled=True, metrics=metrics.drain())
+
+
+def _fetch_cached(cache, source, targets, output_folder, guard_size, digest, options=None):
+    """从输出缓存取出命中的目标格式，返回 {目标格式: 输出路径}"""
+    os.makedirs(output_folder, exist_ok=True)
+    base_name = engine.default_base_name(source)
+    outputs = {}
+    for target_format in targets:
+        key = engine.cache_key(cache, source, target_format, guard_size, digest, options)
+        output_file = cache.fetch(key, output_folder, base_name)
+        if output_file is not None:
+            outputs[target_format] = output_file
+    return outputs
+
+
+def convert_file(source, targets, output_folder, guard_size=0, cancel=None, cache=None,
+                 options=None, sources=None):
+    """在工作进程中转换单个文件：源只解码一次，每个目标格式的失败互不影响
+
+    cache 为可选的 OutputCache，命中的目标格式直接取用缓存的产物；
+    options 为 {目标格式: {参数: 值}}，见 engine.TARGET_OPTIONS；
+    sources 为可选的 engine.SourceCache，常驻进程用它在多次转换之间保留解码结果。
+    """
+    cancel = cancel or _worker_cancel
+    outputs = {}
+    errors = {}
+    if cancel is not None and cancel.cancelled:
+        return _cancelled_result(source, targets)
+    try:
+        digest = None
+        if cache is not None:
+            digest = engine.source_digest(source)
+            outputs = _fetch_cached(cache, source, targets, output_folder, guard_size, digest,
+                                    options)
+        remaining = [t for t in targets if t not in outputs]
+        if not remaining:
+            return FileResult(source, outputs, errors, metrics=metrics.drain())
+        # 只输出图标尺寸时，超大的源图按图标尺寸缩小解码
+        load = sources.load if sources is not None else engine.load_source
+        master = load(source, guard_size, digest, engine.decode_size(remaining))
+    except Exception as e:
+        return FileResult(source, outputs, {t: str(e) for t in targets if t not in outputs},
+                          metrics=metrics.drain())
+
+    try:
+        for target_format in remaining:
+            try:
+                outputs[target_format] = engine.convert(master, target_format, output_folder,
+                                                        cancel=cancel, cache=cache, options=options)
+            except engine.ConversionCancelled:
+                return _cancelled_result(source, targets, outputs)
+            except Exception as e:
+                errors[target_format] = str(e)
+    finally:
+        # 工作进程会继续处理其他文件，立即释放这个文件的像素数据；缓存中的源由缓存负责淘汰
+        if sources is None:
+            master.release()
+    return FileResult(source, outputs, errors, metrics=metrics.drain())
+
+
+def _estimate_memory(source, targets):
+    try:
+        return engine.estimate_memory(source, targets)
+    except Exception:
+        # 无法读取文件头时按 0 估算，转换时再报告错误
+        return 0
+
+
+def run_batch(jobs, targets, workers=None, max_pending=None, on_result=None, guard_size=0,
+              cancel=None, cache=None, memory_budget=None, options=None):
+    """执行批量转换，返回 FileResult 列表
+
+    jobs 为 (源文件, 输出文件夹) 的可迭代对象，会被惰性消费；
+    max_pending 限制同时提交到进程池中的任务数，默认为进程数的两倍；
+    guard_size 为尺寸金字塔的质量保护阈值；
+    cancel 为取消标记，多进程时必须由 make_cancel_token() 创建；
+    cache 为可选的 OutputCache，各工作进程共用同一个缓存目录；
+    memory_budget 为在途文件估算峰值内存之和的上限（字节），估算超出预算的单个文件会单独转换；
+    options 为各目标格式的参数 {目标格式: {参数: 值}}。
+    取消后尚未提交的文件不会出现在结果中。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    cancel = cancel or make_cancel_token()
+    results = []
+
+    def collect(result):
+        # 工作进程交回的统计记录并入主进程的统计
+        metrics.add(result.metrics)
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    # 单进程时直接在当前进程执行，便于调试
+    if workers == 1:
+        for source, output_folder in jobs:
+            if cancel.cancelled:
+                break
+            collect(convert_file(source, targets, output_folder, guard_size, cancel, cache, options))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cancel.event, metrics.enabled())) as executor:
+        # future -> (源文件, 估算的峰值内存)
+        pending = {}
+        in_flight_bytes = 0
+        budget = memory_budget or float('inf')
+        for source, output_folder in jobs:
+            nbytes = _estimate_memory(source, targets) if memory_budget else 0
+            # 没有在途任务时总是提交，保证超出预算的文件也能转换
+            while pending and (len(pending) >= max_pending or in_flight_bytes + nbytes > budget):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_source, done_bytes = pending.pop(future)
+                    in_flight_bytes -= done_bytes
+                    collect(_future_result(future, done_source, targets))
+            if cancel.cancelled:
+                break
+            future = executor.submit(convert_file, source, targets, output_folder, guard_size,
+                                     cache=cache, options=options)
+            pending[future] = (source, nbytes)
+            in_flight_bytes += nbytes
+
+        if cancel.cancelled:
+            # 还没开始执行的任务直接撤销
+            for future in pending:
+                future.cancel()
+
+        for future in list(pending):
+            collect(_future_result(future, pending.pop(future)[0], targets))
+
+    # 各工作进程只按自己写入的条目估计缓存大小，结束时按实际大小淘汰一次
+    if cache is not None:
+        cache.evict()
+    return results
+
+
+def _future_result(future, source, targets):
+    if future.cancelled():
+        return _cancelled_result(source, targets)
+    try:
+        return future.result()
+    except Exception as e:
+        # 工作进程异常退出等情况，整个文件记为失败
+        return FileResult(source, {}, {t: str(e) for t in targets})
@@ -0,0 +1,354 @@
+"""命令行入口
+
+用法示例：
+    python -m icon_converter convert --to ico,icns,favicon src_dir out_dir -j 8
+    python -m icon_converter convert --to ico --cache src_dir out_dir
+    python -m icon_converter watch --to ico,icns src_dir out_dir
+    python -m icon_converter serve --port 8765
+    python -m icon_converter                  （不带参数时启动图形界面）
+
+转换目录时在输出目录中维护增量清单，再次运行只转换有改动的文件，--full 强制全部重新转换。
+
+各子命令用到的模块（以及 PIL、asyncio 等）在执行子命令时才导入，--help 和参数错误的启动开销很小。
+"""
+import os
+import sys
+import signal
+import argparse
+
+from . import metrics
+from .formats import TARGET_FORMATS
+from .output_cache import OutputCache, OUTPUT_CACHE_DIR, OUTPUT_CACHE_BYTES
+
+
+def parse_targets(value):
+    targets = [t.strip().lower() for t in value.split(',') if t.strip()]
+    unknown = [t for t in targets if t not in TARGET_FORMATS]
+    if unknown or not targets:
+        raise argparse.ArgumentTypeError(
+            f"不支持的目标格式: {','.join(unknown) or value}（可选: {','.join(TARGET_FORMATS)}）")
+    return targets
+
+
+def parse_quality(value):
+    quality = int(value)
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"编码质量应在 1～100 之间: {value}")
+    return quality
+
+
+def parse_colors(value):
+    colors = int(value)
+    if not 1 <= colors <= 64:
+        raise argparse.ArgumentTypeError(f"颜色数应在 1～64 之间: {value}")
+    return colors
+
+
+def check_svg_options(svg, prefix=""):
+    """SVG 参数与转换方式不符时抛出 ValueError：detail、colors 只用于 trace，codec、quality 只用于 embed，
+    quality 只用于 jpeg、webp 编码。prefix 为错误信息中参数名的前缀"""
+    trace = svg.get("mode", "embed") == "trace"
+    for name in ("codec", "quality") if trace else ("detail", "colors"):
+        if name in svg:
+            raise ValueError(f"{prefix}{name} 只用于 {'embed' if trace else 'trace'} 转换方式")
+    if "quality" in svg and svg.get("codec", "png") == "png":
+        raise ValueError(f"{prefix}quality 只用于 jpeg、webp 编码")
+
+
+def add_conversion_arguments(parser):
+    """convert 和 watch 共用的参数"""
+    parser.add_argument("--to", dest="targets", type=parse_targets, required=True,
+                        help=f"目标格式，逗号分隔（{','.join(TARGET_FORMATS)}）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行转换数，默认为CPU核心数")
+    parser.add_argument("--quality-guard", type=int, default=0, metavar="PX",
+                        help="最长边不超过该值的图标尺寸直接从原图缩放，默认全部链式缩放")
+    parser.add_argument("--svg-mode", choices=("embed", "trace"), default=None,
+                        help="位图转换为 SVG 的方式，默认 embed 嵌入位图；trace 描摹为路径（需要 NumPy），适合扁平风格的图标")
+    parser.add_argument("--svg-detail", choices=("low", "medium", "high"), default=None,
+                        help="--svg-mode trace 的细节级别，默认 medium")
+    parser.add_argument("--svg-colors", type=parse_colors, default=None, metavar="N",
+                        help="--svg-mode trace 的颜色数（1～64），默认由细节级别决定")
+    parser.add_argument("--svg-codec", choices=("png", "jpeg", "webp"), default=None,
+                        help="位图包装为 SVG 时嵌入的编码，默认 png；jpeg、webp 体积小得多")
+    parser.add_argument("--svg-quality", type=parse_quality, default=None, metavar="1-100",
+                        help="--svg-codec 为 jpeg、webp 时的编码质量，默认 90")
+    parser.add_argument("--optimize-png", action="store_true",
+                        help="优化 png、ico、favicon、web 中 PNG 数据的体积（无损，尝试多种编码取最小），转换更慢")
+    parser.add_argument("--web-name", default=None, metavar="NAME",
+                        help="网页图标包（--to web）manifest 中的应用名称，默认为源文件名")
+    parser.add_argument("--web-theme-color", default=None, metavar="COLOR",
+                        help="网页图标包的主题色，默认 #ffffff")
+    parser.add_argument("--web-background", default=None, metavar="COLOR",
+                        help="apple-touch-icon 和可遮罩图标的背景色，默认 #ffffff")
+    parser.add_argument("--web-path", default=None, metavar="URL",
+                        help="manifest 和 HTML 片段中图标的 URL 路径前缀，默认 /")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="只列出失败的文件")
+    parser.add_argument("--cache", action="store_true",
+                        help="使用输出缓存，内容和设置未变的源直接复用之前的转换结果")
+    parser.add_argument("--cache-dir", default=OUTPUT_CACHE_DIR,
+                        help=f"输出缓存目录，默认为 {OUTPUT_CACHE_DIR}")
+    parser.add_argument("--cache-size", type=int, default=OUTPUT_CACHE_BYTES // (1024 * 1024),
+                        metavar="MB", help="输出缓存的容量上限（MB），默认 1024")
+    add_metrics_arguments(parser)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-log", metavar="FILE",
+                        help="把每次转换的分阶段耗时以 JSON 行追加到文件（- 为标准错误）")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="把累计的分阶段统计以 Prometheus 文本格式写入文件")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="icon_converter", description="图标格式互转工具（命令行模式）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="批量转换文件或目录")
+    convert_parser.add_argument("source", help="源文件或源目录（递归遍历）")
+    convert_parser.add_argument("output", help="输出目录，保持源目录的相对结构")
+    add_conversion_arguments(convert_parser)
+    convert_parser.add_argument("--max-pending", type=int, default=None,
+                                help="同时在途的最大任务数，默认为工作进程数的两倍")
+    convert_parser.add_argument("--full", action="store_true",
+                                help="忽略增量清单，重新转换目录中的全部文件")
+    convert_parser.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                                help="同时转换的文件估算峰值内存之和的上限，处理超大图片时限制并发")
+
+    watch_parser = subparsers.add_parser("watch", help="监视目录，自动转换新增或修改的图片")
+    watch_parser.add_argument("source", help="要监视的源目录")
+    watch_parser.add_argument("output", help="输出目录，保持源目录的相对结构")
+    add_conversion_arguments(watch_parser)
+    watch_parser.add_argument("--debounce", type=float, default=None,
+                              metavar="SECONDS", help="目录安静多久后开始转换，默认 0.5 秒")
+    watch_parser.add_argument("--poll", action="store_true",
+                              help="定期扫描目录而不使用 inotify（网络文件系统等）")
+
+    serve_parser = subparsers.add_parser("serve", help="启动本地 HTTP 转换服务")
+    serve_parser.add_argument("--host", default=None, help="监听地址，默认 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=None, help="监听端口，默认 8765")
+    serve_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                              help="转换进程数，默认为CPU核心数")
+    serve_parser.add_argument("--max-queue", type=int, default=None,
+                              help="等待中的请求数上限，超出时返回 503，默认为进程数的四倍")
+    serve_parser.add_argument("--max-body", type=int, default=None,
+                              metavar="MB", help="请求体大小上限（MB），默认 64")
+    serve_parser.add_argument("--quality-guard", type=int, default=0, metavar="PX",
+                              help="最长边不超过该值的图标尺寸直接从原图缩放，默认全部链式缩放")
+    serve_parser.add_argument("--metrics", action="store_true",
+                              help="打开分阶段统计，通过 GET /metrics 读取")
+    add_metrics_arguments(serve_parser)
+    return parser
+
+
+def setup_metrics(args):
+    """按参数打开分阶段统计，未要求时保持关闭（环境变量打开的除外）"""
+    if getattr(args, "metrics", False) or args.metrics_log or args.metrics_file:
+        metrics.enable(args.metrics_log)
+
+
+def write_metrics(args):
+    if args.metrics_file and metrics.enabled():
+        metrics.recorder().write_prometheus(args.metrics_file)
+
+
+def conversion_options(args):
+    """由命令行参数得到各目标格式的参数 {目标格式: {参数: 值}}，全部为默认值时返回 None；
+    SVG 参数与转换方式不符时抛出 ValueError（见 check_svg_options）"""
+    options = {}
+    if args.optimize_png:
+        options.update((target, {"optimize": True}) for target in ("png", "ico", "favicon", "web"))
+    svg = {}
+    if args.svg_mode:
+        svg["mode"] = args.svg_mode
+    if args.svg_detail:
+        svg["detail"] = args.svg_detail
+    if args.svg_colors is not None:
+        svg["colors"] = args.svg_colors
+    if args.svg_codec:
+        svg["codec"] = args.svg_codec
+    if args.svg_quality is not None:
+        svg["quality"] = args.svg_quality
+    if svg:
+        check_svg_options(svg, "--svg-")
+        options["svg"] = svg
+    web = {}
+    if args.web_name:
+        web["app_name"] = args.web_name
+    if args.web_theme_color:
+        web["theme_color"] = args.web_theme_color
+    if args.web_background:
+        web["background"] = args.web_background
+    if args.web_path is not None:
+        web["path"] = args.web_path
+    if web:
+        options["web"] = {**options.get("web", {}), **web}
+    return options or None
+
+
+def make_cache(args):
+    if not args.cache:
+        return None
+    return OutputCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def install_cancel_handler(cancel):
+    """第一次 Ctrl+C（或 SIGTERM）取消批量任务，第二次 Ctrl+C 强制退出"""
+    def handler(signum, frame):
+        if cancel.cancelled and signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        print("正在取消，等待进行中的文件停止...（再次按 Ctrl+C 强制退出）", file=sys.stderr)
+        cancel.cancel()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+
+def print_result(result, quiet=False, stream=sys.stdout):
+    if result.cancelled:
+        if not quiet:
+            print(f"取消  {result.source}", file=stream)
+    elif result.errors:
+        for target_format, message in result.errors.items():
+            print(f"失败  {result.source} [{target_format}]: {message}", file=stream)
+    elif not quiet:
+        print(f"成功  {result.source} -> {', '.join(result.outputs.values())}", file=stream)
+
+
+def print_summary(results, quiet=False, stream=sys.stdout):
+    cancelled = [r for r in results if r.cancelled]
+    failed = [r for r in results if r.errors and not r.cancelled]
+    for result in results:
+        print_result(result, quiet, stream)
+    succeeded = len(results) - len(failed) - len(cancelled)
+    summary = f"共 {len(results)} 个文件，成功 {succeeded} 个，失败 {len(failed)} 个"
+    if cancelled:
+        summary += f"，取消 {len(cancelled)} 个"
+    print(summary, file=stream)
+
+
+def run_convert(args):
+    from . import batch
+    from .manifest import BuildManifest
+
+    if not os.path.exists(args.source):
+        print(f"源文件不存在: {args.source}", file=sys.stderr)
+        return 2
+
+    cancel = batch.make_cancel_token()
+    install_cancel_handler(cancel)
+
+    cache = make_cache(args)
+    options = conversion_options(args)
+    setup_metrics(args)
+    jobs = batch.iter_jobs(args.source, args.output, exclude=args.output)
+    manifest = None
+    if os.path.isdir(args.source):
+        manifest = BuildManifest(args.source, args.output)
+        jobs = list(jobs)
+        removed = manifest.remove_orphans(source for source, _ in jobs)
+        skipped = []
+        if not args.full:
+            jobs, skipped = manifest.plan(jobs, args.targets, args.quality_guard, options)
+        if removed or skipped:
+            print(f"跳过 {len(skipped)} 个未改动的文件，删除 {len(removed)} 个过期的输出文件")
+
+    results = batch.run_batch(jobs, args.targets, workers=max(1, args.jobs),
+                              max_pending=args.max_pending, guard_size=args.quality_guard,
+                              cancel=cancel, cache=cache,
+                              memory_budget=args.memory_budget and args.memory_budget * 1024 * 1024,
+                              options=options)
+    if manifest is not None:
+        # 取消时也保存已完成的部分，下次从中断处继续
+        for result in results:
+            if result.outputs:
+                manifest.record(result.source, result.outputs, args.quality_guard, options)
+        manifest.save()
+    write_metrics(args)
+    print_summary(results, quiet=args.quiet)
+    if cancel.cancelled:
+        return 130
+    return 1 if any(r.errors for r in results) else 0
+
+
+def run_watch(args):
+    from . import watch
+
+    if not os.path.isdir(args.source):
+        print(f"源目录不存在: {args.source}", file=sys.stderr)
+        return 2
+    if os.path.abspath(args.output) == os.path.abspath(args.source):
+        print("输出目录不能与监视的源目录相同", file=sys.stderr)
+        return 2
+
+    def on_removed(files):
+        if not args.quiet:
+            for path in files:
+                print(f"删除  {path}")
+
+    def on_result(result):
+        print_result(result, args.quiet)
+        write_metrics(args)
+
+    setup_metrics(args)
+    service = watch.WatchService(args.source, args.output, args.targets, workers=max(1, args.jobs),
+                                 guard_size=args.quality_guard, cache=make_cache(args),
+                                 debounce=args.debounce, poll=args.poll,
+                                 on_result=on_result,
+                                 on_removed=on_removed, options=conversion_options(args))
+    install_cancel_handler(service.cancel)
+    mode = "轮询" if isinstance(service.watcher, watch.PollingWatcher) else "inotify"
+    print(f"正在监视 {args.source}（{mode}），按 Ctrl+C 停止", file=sys.stderr)
+    try:
+        service.run()
+    finally:
+        service.close()
+    return 0
+
+
+def run_serve(args):
+    from . import server
+
+    def on_started(conversion_server):
+        print(f"HTTP 转换服务已启动: http://{conversion_server.host}:{conversion_server.port}/convert?to=ico"
+              f"（{conversion_server.workers} 个转换进程），按 Ctrl+C 停止", file=sys.stderr)
+
+    setup_metrics(args)
+    try:
+        server.serve(args.host, args.port, workers=max(1, args.jobs), max_queue=args.max_queue,
+                     max_body=args.max_body and args.max_body * 1024 * 1024, guard_size=args.quality_guard,
+                     on_started=on_started)
+    except KeyboardInterrupt:
+        pass
+    write_metrics(args)
+    return 0
+
+
+def launch(argv=None):
+    """启动脚本的入口：不带参数时启动图形界面，否则按命令行处理
+
+    只有图形界面需要 Qt 窗口部件，命令行模式不会导入它们。
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return main(argv)
+    from .gui import main as gui_main
+    return gui_main()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in ("convert", "watch"):
+        try:
+            conversion_options(args)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command == "convert":
+        return run_convert(args)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "serve":
+        return run_serve(args)
+    return 0
@@ -0,0 +1,903 @@
+"""图标转换引擎
+
+不依赖任何 Qt 窗口部件的转换逻辑，GUI、命令行和后台任务都调用这里的函数。
+源文件既可以是文件路径，也可以是内存中的图片字节。
+
+源只解码（或栅格化）一次，得到内存中的 SourceImage，
+各个 convert_to_* 函数都可以直接接收 SourceImage，
+convert_many 借此在一次解码后输出全部目标格式。
+
+传入 OutputCache 时，转换结果按源内容哈希缓存，相同的源和设置再次转换时直接取用缓存的产物。
+各阶段的耗时由 metrics 模块统计，默认关闭。
+
+只输出图标尺寸时，超大的源图按所需的最大尺寸缩小解码：JPEG 直接以 1/2～1/8 的比例解码，
+其他格式解码后立即整数倍缩小并释放原始分辨率的像素，之后的缩放都在缩小后的图像上进行。
+"""
+import os
+import io
+import base64
+import shutil
+import hashlib
+import importlib
+import threading
+import contextlib
+from collections import OrderedDict
+from PIL import Image, ImageColor, features
+
+from . import metrics
+from .errors import ConversionError, ConversionCancelled
+from .formats import TARGET_FORMATS
+from .icns import build_icns
+from .ico import build_ico
+from .pngopt import encode_png, optimize_png
+from .pyramid import SizePyramid, fit_size, resizable
+from .svg import SvgDocument, qimage_to_pil, rasterize_svg, render_svg, svg_to_png
+from .trace import trace_image
+from . import web
+
+# 引擎版本，输出内容发生变化时递增，使旧的缓存条目失效
+ENGINE_VERSION = "1.6"
+
+# ICO格式支持多种尺寸，我们创建常用的几种尺寸
+ICO_SIZES = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+
+# Favicon通常包含这些尺寸
+FAVICON_SIZES = [(16, 16), (32, 32), (48, 48), (64, 64)]
+FAVICON_PNG_SIZE = (32, 32)
+
+# ICNS需要特定尺寸的图像
+ICNS_SIZES = [16, 32, 64, 128, 256, 512, 1024]
+
+# 缩小解码时，解码结果的最长边至少保留为最大目标尺寸的这么多倍，再做高质量缩放
+# （与 Image.thumbnail 的 reducing_gap 含义相同）
+REDUCING_GAP = 2
+
+# 只输出图标尺寸的目标格式；PNG 和 SVG 输出原始分辨率
+ICON_TARGETS = ("ico", "icns", "favicon", "web")
+# 图标目标格式共用的缩小解码尺寸。各目标格式使用同一个值，
+# 同一个目标格式的输出不会因为同时转换的其他目标格式而不同
+ICON_DECODE_SIZE = max(ICNS_SIZES)
+
+# SourceCache 的默认容量（字节），按解码后的像素数据估算
+SOURCE_CACHE_BYTES = 256 * 1024 * 1024
+
+# 无法读取尺寸的 SVG 按这个值估算内存
+SVG_MEMORY_ESTIMATE = 64 * 1024 * 1024
+
+# 需要单独导入的 PIL 插件：源文件扩展名或输出格式 -> 插件模块
+_PIL_PLUGINS = {"ICO": "IcoImagePlugin", "ICNS": "IcnsImagePlugin", "WEBP": "WebPImagePlugin"}
+
+# 各目标格式可调的参数及默认值，参数会计入输出缓存的键和增量清单的设置
+TARGET_OPTIONS = {
+    # 位图转换为 SVG 的方式（embed 嵌入位图，trace 描摹为路径）；
+    # 嵌入时的编码（png、jpeg、webp）和有损编码的质量（1～100）；
+    # 描摹时的细节级别（见 trace.DETAIL_LEVELS）和颜色数（0 表示由细节级别决定）
+    "svg": {"mode": "embed", "codec": "png", "quality": 90, "detail": "medium", "colors": 0},
+    # 为 True 时 png 输出以及 ico、favicon 中的 PNG 数据经过体积优化（见 pngopt 模块），更慢但文件更小
+    "png": {"optimize": False},
+    "ico": {"optimize": False},
+    "favicon": {"optimize": False},
+    # 网页图标包：应用名称（为空时取基本名）、主题色、apple-touch-icon 和可遮罩图标的背景色、
+    # 图标所在的 URL 路径前缀（写入 manifest.webmanifest 和 HTML 片段）；optimize 同上
+    "web": {"app_name": "", "theme_color": "#ffffff", "background": "#ffffff", "path": "/",
+            "optimize": False},
+}
+
+# 位图转换为 SVG 的方式
+SVG_MODES = ("embed", "trace")
+
+# SVG 包装可嵌入的编码 -> (PIL 格式, MIME 类型)
+SVG_CODECS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# 流式写出 base64 时每块的原始字节数，必须是 3 的倍数，各块编码后直接拼接
+BASE64_CHUNK = 3 * 64 * 1024
+
+
+class CancelToken:
+    """协作式取消标记
+
+    转换流程在每个尺寸之间调用 check()，被取消后抛出 ConversionCancelled。
+    event 默认为 threading.Event；需要跨进程取消时可传入 multiprocessing.Event。
+    """
+
+    def __init__(self, event=None):
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise ConversionCancelled("转换已取消")
+
+
+class SourceImage:
+    """已解码的源图像，供多个目标格式共用
+
+    image 为已加载到内存的 PIL 图像；document 为 SVG 源解析后的 SvgDocument（非 SVG 时为 None），
+    矢量源的各个图标尺寸直接由它渲染；name 为默认的输出文件基本名；
+    guard_size 传给尺寸金字塔作为质量保护阈值；digest 为源内容的哈希，未知时按需计算。
+    reduced 为 True 时 image 已经按图标尺寸缩小解码，只能用于图标目标格式；
+    reload 用于按图标尺寸重新缩小解码（JPEG 需要）。
+    """
+
+    def __init__(self, image, name=None, document=None, guard_size=0, digest=None, reduced=False,
+                 reload=None):
+        self.image = image
+        self.name = name
+        self.document = document
+        self.guard_size = guard_size
+        self.reduced = reduced
+        self._digest = digest
+        self._reload = reload
+        self._icon_image = None
+        self._pyramid = None
+
+    @property
+    def digest(self):
+        """源内容的 SHA-256，用作输出缓存的键"""
+        if self._digest is None:
+            if self.document is not None:
+                self._digest = hashlib.sha256(self.document.data).hexdigest()
+            else:
+                # 没有原始字节（例如剪贴板图像）时按像素内容计算
+                sha = hashlib.sha256(f"{self.image.mode}{self.image.size}".encode('ascii'))
+                sha.update(self.image.tobytes())
+                self._digest = sha.hexdigest()
+        return self._digest
+
+    @property
+    def svg(self):
+        """SVG 源的原始字节，非 SVG 时为 None"""
+        return self.document.data if self.document is not None else None
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def icon_image(self):
+        """生成图标尺寸的底图：超大的位图先缩小到 ICON_DECODE_SIZE 的 REDUCING_GAP 倍以内
+
+        无论源是否已经按图标尺寸缩小解码，结果都相同，同一目标格式的输出不受同时转换的其他格式影响。
+        """
+        if self._icon_image is None:
+            if self.document is not None or self.reduced or not _needs_reduce(self.image.size):
+                self._icon_image = self.image
+            elif self._reload is not None and self.image.format == 'JPEG':
+                # JPEG 缩小解码的结果与解码后再缩小不同，按图标尺寸重新解码一次
+                self._icon_image = self._reload()
+            else:
+                self._icon_image = _reduce(self.image, release=False)
+        return self._icon_image
+
+    @property
+    def icon_size(self):
+        """计算图标各帧尺寸时使用的源尺寸"""
+        if self.document is not None:
+            return self.document.default_size
+        return self.icon_image.size
+
+    @property
+    def pyramid(self):
+        """ICO、ICNS、Favicon、网页图标包共用的尺寸金字塔，首次使用时创建"""
+        if self._pyramid is None:
+            render = self.document.render_size if self.document is not None else None
+            self._pyramid = SizePyramid(self.icon_image, guard_size=self.guard_size, render=render)
+        return self._pyramid
+
+    def retained_bytes(self):
+        """保留的像素数据的字节数：原图、图标底图以及金字塔中已生成的各级"""
+        images = [self.image]
+        if self._icon_image is not None and self._icon_image is not self.image:
+            images.append(self._icon_image)
+        if self._pyramid is not None:
+            # 其他线程可能正在生成新的层级，先复制一份
+            images.extend(list(self._pyramid.levels.values()))
+        return sum(img.width * img.height * len(img.getbands()) for img in images)
+
+    def release(self):
+        """释放像素数据和金字塔中的各级图像，之后不能再使用
+
+        SVG 的渲染结果可能被栅格化缓存共享，只丢弃引用，不关闭图像。
+        """
+        if self._pyramid is not None:
+            self._pyramid.clear()
+            self._pyramid = None
+        if self.document is None:
+            if self._icon_image is not None and self._icon_image is not self.image:
+                self._icon_image.close()
+            self.image.close()
+        self._icon_image = None
+
+
+def is_svg(source):
+    """判断源（路径或字节）是否为 SVG"""
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:1024]).lstrip()
+        return head.startswith(b'<') and b'<svg' in head
+    return source.lower().endswith('.svg')
+
+
+def is_icns(source):
+    """判断源（路径或字节）是否为 ICNS"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:4]) == b'icns'
+    return source.lower().endswith('.icns')
+
+
+def _load_plugin(format):
+    """只导入 format 对应的 PIL 插件
+
+    PIL 默认只注册 PNG、JPEG、BMP、GIF 等常见格式，遇到其他格式时会一次导入全部约 40 个插件。
+    """
+    plugin = _PIL_PLUGINS.get(format)
+    if plugin is not None:
+        importlib.import_module("PIL." + plugin)
+
+
+def open_image(source):
+    """用 PIL 打开源（路径或字节）"""
+    if isinstance(source, (bytes, bytearray)):
+        if is_icns(source):
+            _load_plugin("ICNS")
+        elif bytes(source[:4]) == b'\0\0\1\0':
+            _load_plugin("ICO")
+        return Image.open(io.BytesIO(source))
+    _load_plugin(os.path.splitext(source)[1].lstrip('.').upper())
+    return Image.open(source)
+
+
+def default_base_name(source):
+    if isinstance(source, SourceImage):
+        return source.name or "image"
+    if isinstance(source, (bytes, bytearray)):
+        return "image"
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def source_digest(source):
+    """源（路径、字节或 SourceImage）内容的 SHA-256"""
+    if isinstance(source, SourceImage):
+        return source.digest
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    sha = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def decode_size(targets):
+    """输出这些目标格式所需的最大边长，有目标需要原始分辨率（PNG、SVG）时返回 None"""
+    if not targets or any(t not in ICON_TARGETS for t in targets):
+        return None
+    return ICON_DECODE_SIZE
+
+
+def _needs_reduce(size):
+    return max(size) > ICON_DECODE_SIZE * REDUCING_GAP
+
+
+def _reduce(img, release=True):
+    """整数倍缩小到 ICON_DECODE_SIZE 的 REDUCING_GAP 倍以上；release 为 True 时释放原图的像素"""
+    factor = max(img.size) // (ICON_DECODE_SIZE * REDUCING_GAP)
+    if factor <= 1:
+        return img
+    full = resizable(img)
+    reduced = full.reduce(factor)
+    if release:
+        full.close()
+        img.close()
+    elif full is not img:
+        full.close()
+    return reduced
+
+
+def _decode(source, max_size=None):
+    """解码位图；max_size 不为空且源图足够大时缩小解码，原始分辨率的像素在缩小后立即释放"""
+    img = open_image(source)
+    if max_size is None or not _needs_reduce(img.size):
+        img.load()
+        return img
+
+    limit = ICON_DECODE_SIZE * REDUCING_GAP
+    # JPEG 按不小于 limit 的最接近比例直接缩小解码，其他格式忽略
+    img.draft(img.mode, fit_size(img.size, (limit, limit)))
+    img.load()
+    return _reduce(img)
+
+
+def estimate_memory(source, targets):
+    """粗略估算转换一个源文件的峰值内存（字节），只读取文件头，供批量调度按内存预算控制并发"""
+    if is_svg(source):
+        return SVG_MEMORY_ESTIMATE
+    with open_image(source) as img:
+        width, height = img.size
+        is_jpeg = img.format == 'JPEG'
+
+    # 各级图标尺寸，按 RGBA 和 4/3 的金字塔系数估算
+    max_size = decode_size(targets)
+    levels = ICON_DECODE_SIZE ** 2 * 4 * 4 // 3
+    decoded = width * height * 4
+    if max_size is None or not _needs_reduce((width, height)):
+        # 模式转换或编码时还会有一份同样大小的拷贝
+        return decoded * 2 + levels
+
+    limit = ICON_DECODE_SIZE * REDUCING_GAP
+    if is_jpeg:
+        scale = 1
+        while scale < 8 and max(width, height) // (scale * 2) >= limit:
+            scale *= 2
+        decoded //= scale * scale
+    return decoded + limit * limit * 4 + levels
+
+
+def load_source(source, guard_size=0, digest=None, max_size=None):
+    """解码（SVG 则栅格化）源，返回 SourceImage；已是 SourceImage 时原样返回
+
+    digest 为已经算好的源内容哈希，可以省去输出缓存再次读取源文件；
+    max_size 为转换需要的最大边长（见 decode_size），超大的源图会按它缩小解码。
+    """
+    if isinstance(source, SourceImage):
+        return source
+
+    name = None if isinstance(source, (bytes, bytearray)) else default_base_name(source)
+
+    if is_svg(source):
+        document = SvgDocument.load(source)
+        size = (None, None)
+        if max_size is not None and _needs_reduce(document.default_size):
+            # 各图标尺寸直接从矢量渲染，主图不需要超过缩小解码的上限
+            limit = ICON_DECODE_SIZE * REDUCING_GAP
+            size = fit_size(document.default_size, (limit, limit))
+        return SourceImage(document.render(*size), name, document=document, guard_size=guard_size,
+                           digest=digest)
+
+    try:
+        with metrics.stage("decode") as stage:
+            img = _decode(source, max_size)
+            stage.add_bytes(img.width * img.height * len(img.getbands()))
+    except Exception as e:
+        if is_icns(source):
+            raise ConversionError(f"无法处理ICNS文件: {str(e)}")
+        raise
+    return SourceImage(img, name, guard_size=guard_size, digest=digest, reduced=max_size is not None,
+                       reload=lambda: _decode(source, ICON_DECODE_SIZE))
+
+
+class SourceCache:
+    """线程安全的 LRU 缓存，按 (路径, 修改时间, 大小) 保留解码后的源，按像素数据的字节数限制总大小
+
+    供常驻进程（监视模式）在多次转换之间复用解码结果和尺寸金字塔；文件改动后键随之变化，
+    旧的条目按 LRU 淘汰。淘汰时只丢弃引用，不调用 release()，正在使用它的转换不受影响。
+    条目的大小包括图标底图和金字塔的各级（见 SourceImage.retained_bytes），取出条目后的转换
+    还会生成新的层级，因此每次 load() 都重新计算全部条目的大小。
+    """
+
+    def __init__(self, max_bytes=SOURCE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # 命中次数
+        self.hits = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path, guard_size=0, digest=None, max_size=None):
+        """与 load_source() 相同，文件未改动时返回之前的解码结果"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, guard_size, max_size)
+        with self._lock:
+            master = self._items.get(key)
+            if master is not None:
+                self.hits += 1
+                self._items.move_to_end(key)
+                self._trim()
+                return master
+
+        master = load_source(path, guard_size, digest, max_size)
+        with self._lock:
+            self._items[key] = master
+            self._trim()
+        return master
+
+    def _trim(self):
+        """重新计算总大小，超出上限时淘汰最久未用的条目；单个条目超过上限时不缓存"""
+        sizes = {key: master.retained_bytes() for key, master in self._items.items()}
+        self.current_bytes = sum(sizes.values())
+        while self.current_bytes > self.max_bytes:
+            key, _ = self._items.popitem(last=False)
+            self.current_bytes -= sizes[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _step(progress, cancel, done, total):
+    """检查取消标记并报告进度
+
+    progress 为 progress(已完成步数, 总步数) 形式的回调，cancel 为 CancelToken，均可以为空。
+    文件写入后的最后一步只报告进度，不再检查取消。
+    """
+    if cancel is not None:
+        cancel.check()
+    if progress is not None:
+        progress(done, total)
+
+
+def _encode(img, format, **params):
+    """把图像编码为字节，PNG 经过 pngopt.encode_png"""
+    format = format.upper()
+    _load_plugin(format)
+    with metrics.stage("encode") as stage:
+        if format == 'PNG':
+            data = encode_png(img, **params)
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, format=format, **params)
+            data = buffer.getvalue()
+        stage.add_bytes(len(data))
+    return data
+
+
+def _encode_png(img, optimize=False):
+    """编码 PNG；optimize 为 True 时搜索最小的无损编码，节省的字节数记入本次转换的统计"""
+    if not optimize:
+        return _encode(img, 'PNG')
+    with metrics.stage("encode") as stage:
+        data, report = optimize_png(img)
+        stage.add_bytes(len(data))
+    metrics.annotate(saved_bytes=report.baseline - report.size)
+    return data
+
+
+# convert_to_memory() 转换期间，当前线程的输出写入这里的 {文件名: 字节}，不落盘
+_memory = threading.local()
+
+
+@contextlib.contextmanager
+def _open_output(output_file):
+    """打开输出文件用于写入；在 convert_to_memory() 中时写入内存"""
+    files = getattr(_memory, "files", None)
+    if files is None:
+        with open(output_file, 'wb') as f:
+            yield f
+    else:
+        buffer = io.BytesIO()
+        yield buffer
+        files[os.path.basename(output_file)] = buffer.getvalue()
+
+
+def _write_file(output_file, data):
+    with metrics.stage("write", len(data)):
+        with _open_output(output_file) as f:
+            f.write(data)
+
+
+def _ico_frame_sizes(master, sizes):
+    """ICO 中实际要写入的各帧尺寸
+
+    与 PIL 的默认行为一致：跳过比源图更大的尺寸，非正方形源图保持宽高比。
+    SVG 源可以无损放大，因此所有尺寸都直接渲染。
+    """
+    width, height = master.icon_size
+    vector = master.document is not None
+    boxes = [box for box in sizes if vector or (box[0] <= width and box[1] <= height)]
+    return sorted({fit_size(master.icon_size, box, upscale=vector) for box in boxes})
+
+
+def _save_ico(master, output_file, sizes, on_level=None, optimize=False):
+    """保存多尺寸 ICO，各尺寸取自尺寸金字塔，每个尺寸选择最小的编码（见 ico 模块）"""
+    frame_sizes = _ico_frame_sizes(master, sizes)
+    if frame_sizes:
+        frames = master.pyramid.build(frame_sizes, on_level)
+    else:
+        # 源图比最小的尺寸还小，只写入原尺寸，不放大
+        frames = [master.image]
+    return _write_ico(frames, output_file, optimize)
+
+
+def _write_ico(frames, output_file, optimize=False):
+    """把各帧编码为 ICO 并写入文件，每个尺寸选择最小的编码（见 ico 模块）"""
+    data, report = build_ico(frames, optimize)
+    # 相对 PIL 默认编码（全部为 32 位 PNG）节省的字节数记入本次转换的统计
+    metrics.annotate(ico_bytes=report.size, saved_bytes=report.baseline - report.size)
+    _write_file(output_file, data)
+    return report
+
+
+def convert_to_ico(source, output_folder, base_name, progress=None, cancel=None, optimize=False):
+    output_file = os.path.join(output_folder, f"{base_name}.ico")
+    master = load_source(source, max_size=decode_size(["ico"]))
+
+    # 每个尺寸一步，最后写文件一步
+    total = len(_ico_frame_sizes(master, ICO_SIZES)) + 1
+    _save_ico(master, output_file, ICO_SIZES, lambda done: _step(progress, cancel, done, total), optimize)
+    _step(progress, None, total, total)
+
+    return output_file
+
+
+def convert_to_icns(source, output_folder, base_name, progress=None, cancel=None):
+    """生成 ICNS，在进程内直接编码，所有平台行为一致"""
+    output_file = os.path.join(output_folder, f"{base_name}.icns")
+    master = load_source(source, max_size=decode_size(["icns"]))
+
+    # 创建各种尺寸的图像，从大到小链式缩放
+    total = len(ICNS_SIZES) + 1
+    images = master.pyramid.build([(size, size) for size in ICNS_SIZES],
+                                  lambda done: _step(progress, cancel, done, total))
+
+    _write_file(output_file, build_icns(dict(zip(ICNS_SIZES, images))))
+    _step(progress, None, total, total)
+    return output_file
+
+
+def convert_to_png(source, output_folder, base_name, progress=None, cancel=None, optimize=False):
+    output_file = os.path.join(output_folder, f"{base_name}.png")
+
+    img = load_source(source).image
+    _step(progress, cancel, 0, 1)
+    # 如果图像有透明通道，保留它
+    if not (img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)):
+        # 转换为RGB模式
+        img = img.convert('RGB')
+    _write_file(output_file, _encode_png(img, optimize))
+    _step(progress, None, 1, 1)
+
+    return output_file
+
+
+def convert_to_favicon(source, output_folder, base_name, progress=None, cancel=None, optimize=False):
+    # 创建favicon.ico文件（包含多种尺寸）
+    output_file = os.path.join(output_folder, f"{base_name}_favicon.ico")
+    master = load_source(source, max_size=decode_size(["favicon"]))
+
+    # 各个 ICO 尺寸、ICO 文件、PNG 文件各算一步
+    total = len(_ico_frame_sizes(master, FAVICON_SIZES)) + 2
+    _save_ico(master, output_file, FAVICON_SIZES, lambda done: _step(progress, cancel, done, total),
+              optimize)
+    _step(progress, None, total - 1, total)
+
+    # 同时创建一个PNG格式的favicon
+    png_output = os.path.join(output_folder, f"{base_name}_favicon.png")
+    favicon_img = master.pyramid.get(FAVICON_PNG_SIZE)
+    _write_file(png_output, _encode_png(favicon_img, optimize))
+    _step(progress, None, total, total)
+
+    return output_file
+
+
+def _web_icon_size(master, icon):
+    """网页图标中源图缩放后的尺寸，可遮罩图标缩小到安全区以内"""
+    inner = icon.size
+    if icon.purpose == "maskable":
+        inner = max(1, round(icon.size * web.MASKABLE_SAFE_ZONE))
+    # 网页图标的尺寸由清单和 HTML 声明，位图源比目标小时也要放大
+    return fit_size(master.icon_size, (inner, inner), upscale=True)
+
+
+def _web_icon(master, icon, background):
+    """正方形的网页图标：源图居中，apple-touch-icon 和可遮罩图标铺满背景色，其余保留透明"""
+    img = master.pyramid.get(_web_icon_size(master, icon))
+    size = (icon.size, icon.size)
+    if icon.purpose in ("apple", "maskable"):
+        canvas = Image.new('RGB', size, background)
+    elif img.size == size:
+        return img
+    else:
+        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
+    rgba = img.convert('RGBA')
+    canvas.paste(rgba, ((icon.size - img.width) // 2, (icon.size - img.height) // 2), rgba)
+    return canvas
+
+
+def _web_ico_icons(master):
+    """favicon.ico 中的各帧，与 PNG 图标一样补齐为正方形
+
+    位图源不放大到超过最长边的尺寸；比最小的尺寸还小时只写入最小的尺寸，与 favicon PNG 一致。
+    """
+    vector = master.document is not None
+    sizes = [size for size, _ in web.ICO_SIZES if vector or size <= max(master.icon_size)]
+    return [web.WebIcon(web.ICO_NAME, size, "favicon") for size in sizes or [web.ICO_SIZES[0][0]]]
+
+
+def convert_to_web(source, output_folder, base_name, progress=None, cancel=None, app_name="",
+                   theme_color="#ffffff", background="#ffffff", path="/", optimize=False):
+    """生成网页图标包（见 web 模块）：favicon.ico、各尺寸 PNG、manifest.webmanifest 和 HTML 片段
+
+    源只解码一次，所有尺寸在同一个尺寸金字塔中从大到小生成，ICO 与 PNG 共用相同尺寸的缩放结果。
+    """
+    for name, value in (("theme_color", theme_color), ("background", background)):
+        try:
+            ImageColor.getrgb(value)
+        except ValueError:
+            raise ConversionError(f"{name} 不是有效的颜色: {value}")
+    fill = ImageColor.getcolor(background, 'RGB')
+
+    files = [os.path.join(output_folder, name) for name in web.file_names(base_name)]
+    master = load_source(source, max_size=decode_size(["web"]))
+
+    # 每个缩放尺寸一步，每个输出文件一步
+    ico_icons = _web_ico_icons(master)
+    levels = {_web_icon_size(master, icon) for icon in ico_icons + web.ICONS}
+    total = len(levels) + len(files)
+    master.pyramid.build(levels, lambda done: _step(progress, cancel, done, total))
+    done = len(levels)
+
+    _write_ico([_web_icon(master, icon, fill) for icon in ico_icons], files[0], optimize)
+    done += 1
+    _step(progress, None, done, total)
+    for icon, output_file in zip(web.ICONS, files[1:]):
+        _write_file(output_file, _encode_png(_web_icon(master, icon, fill), optimize))
+        done += 1
+        _step(progress, None, done, total)
+
+    _write_file(files[-2], web.manifest(base_name, app_name, theme_color, background, path))
+    _step(progress, None, done + 1, total)
+    ico_sizes = [icon.size for icon in ico_icons]
+    _write_file(files[-1], web.head_html(base_name, theme_color, path, ico_sizes))
+    _step(progress, None, total, total)
+    return files[0]
+
+
+def _svg_payload(img, codec, quality):
+    """把图像编码为 SVG 包装中嵌入的字节，返回 (MIME 类型, 字节)"""
+    if codec not in SVG_CODECS:
+        raise ConversionError(f"不支持的 SVG 嵌入编码: {codec}（可选: {','.join(SVG_CODECS)}）")
+    if not 1 <= quality <= 100:
+        raise ConversionError(f"编码质量应在 1～100 之间: {quality}")
+    format, mime = SVG_CODECS[codec]
+    if codec == "png":
+        return mime, _encode(img, format)
+
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if codec == "jpeg":
+        if has_alpha:
+            # JPEG 不支持透明，合成到白色背景上
+            rgba = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            img = background
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        return mime, _encode(img, format, quality=quality)
+
+    if not features.check("webp"):
+        raise ConversionError("当前的 Pillow 不支持 WebP 编码")
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    return mime, _encode(img, format, quality=quality)
+
+
+def _write_svg_wrapper(output_file, width, height, mime, payload):
+    """把嵌入图像的 SVG 流式写入文件：base64 按块编码后直接写出，不在内存中拼出整个文档"""
+    header = (f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <image width="{width}" height="{height}" xlink:href="data:{mime};base64,""").encode('utf-8')
+    footer = b"""\"/>
+</svg>
+"""
+    view = memoryview(payload)
+    with metrics.stage("write") as stage:
+        with _open_output(output_file) as f:
+            f.write(header)
+            for offset in range(0, len(view), BASE64_CHUNK):
+                chunk = base64.b64encode(view[offset:offset + BASE64_CHUNK])
+                f.write(chunk)
+                stage.add_bytes(len(chunk))
+            f.write(footer)
+        stage.add_bytes(len(header) + len(footer))
+
+
+def convert_to_svg(source, output_folder, base_name, progress=None, cancel=None, mode="embed",
+                   codec="png", quality=90, detail="medium", colors=0):
+    """SVG 源直接复制；位图按 mode 转换
+
+    embed 包装为嵌入 codec 编码图像的 SVG（jpeg、webp 时使用 quality）；
+    trace 按细节级别 detail 描摹为路径，colors 大于 0 时指定颜色数。
+    """
+    if mode not in SVG_MODES:
+        raise ConversionError(f"不支持的 SVG 转换方式: {mode}（可选: {','.join(SVG_MODES)}）")
+    output_file = os.path.join(output_folder, f"{base_name}.svg")
+
+    # 如果源文件已经是SVG，直接复制
+    if isinstance(source, str) and is_svg(source):
+        if getattr(_memory, "files", None) is not None:
+            with open(source, 'rb') as f:
+                _write_file(output_file, f.read())
+        else:
+            with metrics.stage("write", os.path.getsize(source)):
+                shutil.copy(source, output_file)
+        _step(progress, None, 1, 1)
+        return output_file
+
+    master = load_source(source)
+    if master.svg is not None:
+        _write_file(output_file, master.svg)
+        _step(progress, None, 1, 1)
+        return output_file
+
+    _step(progress, cancel, 0, 1)
+
+    img = master.image
+    if mode == "trace":
+        with metrics.stage("trace"):
+            document = trace_image(img, detail, colors, cancel)
+        _write_file(output_file, document)
+        _step(progress, None, 1, 1)
+        return output_file
+
+    # 嵌入模式只是把位图包装为 SVG，适合照片等无法描摹的图像
+    mime, payload = _svg_payload(img, codec, quality)
+    _write_svg_wrapper(output_file, img.width, img.height, mime, payload)
+    _step(progress, None, 1, 1)
+
+    return output_file
+
+
+_CONVERTERS = {
+    "ico": convert_to_ico,
+    "icns": convert_to_icns,
+    "png": convert_to_png,
+    "favicon": convert_to_favicon,
+    "svg": convert_to_svg,
+    "web": convert_to_web,
+}
+
+
+def output_files(target_format, output_folder, base_name):
+    """目标格式会写出的全部文件，第一个为主输出文件"""
+    if target_format == "favicon":
+        suffixes = ["_favicon.ico", "_favicon.png"]
+    elif target_format == "web":
+        return [os.path.join(output_folder, name) for name in web.file_names(base_name)]
+    else:
+        suffixes = [f".{target_format}"]
+    return [os.path.join(output_folder, f"{base_name}{suffix}") for suffix in suffixes]
+
+
+def target_options(target_format, options=None):
+    """目标格式的参数：options 为 {目标格式: {参数: 值}}，未给出的参数取 TARGET_OPTIONS 中的默认值"""
+    defaults = TARGET_OPTIONS.get(target_format, {})
+    given = (options or {}).get(target_format) or {}
+    unknown = sorted(set(given) - set(defaults))
+    if unknown:
+        raise ConversionError(f"{target_format} 不支持的参数: {','.join(unknown)}")
+    return {**defaults, **given}
+
+
+def target_settings(target_format, guard_size=0, options=None):
+    """影响目标格式输出内容的设置，作为输出缓存键的一部分"""
+    sizes = {
+        "ico": ICO_SIZES,
+        "icns": ICNS_SIZES,
+        "favicon": [FAVICON_SIZES, FAVICON_PNG_SIZE],
+        "web": [web.ICO_SIZES, web.ICONS, web.MASKABLE_SAFE_ZONE],
+    }.get(target_format)
+    settings = {"engine": ENGINE_VERSION, "sizes": sizes, "guard_size": guard_size}
+    if target_format in TARGET_OPTIONS:
+        settings["options"] = target_options(target_format, options)
+    return settings
+
+
+def cache_key(cache, source, target_format, guard_size=None, digest=None, options=None):
+    """源和目标格式在输出缓存中的键"""
+    if guard_size is None:
+        guard_size = source.guard_size if isinstance(source, SourceImage) else 0
+    digest = digest or source_digest(source)
+    return cache.entry_key(digest, target_format, target_settings(target_format, guard_size, options))
+
+
+def convert(source, target_format, output_folder, base_name=None, progress=None, cancel=None,
+            cache=None, options=None):
+    """把源（路径、字节或 SourceImage）转换为目标格式，返回输出文件路径
+
+    progress 为可选的进度回调 progress(已完成步数, 总步数)，多尺寸格式每生成一个尺寸回调一次；
+    cancel 为可选的 CancelToken，在每个尺寸之间检查，取消时抛出 ConversionCancelled，
+    此时输出文件尚未写入；cache 为可选的 OutputCache，命中时直接取用缓存的产物；
+    options 为 {目标格式: {参数: 值}}，可用的参数见 TARGET_OPTIONS。
+    """
+    if cancel is not None:
+        cancel.check()
+    if target_format not in _CONVERTERS:
+        raise ConversionError(f"不支持的目标格式: {target_format}")
+
+    if base_name is None:
+        base_name = default_base_name(source)
+    params = target_options(target_format, options)
+
+    # 确保输出文件夹存在
+    os.makedirs(output_folder, exist_ok=True)
+
+    with metrics.conversion(target_format, source if isinstance(source, str) else base_name):
+        key = None
+        if cache is not None:
+            with metrics.stage("cache"):
+                key = cache_key(cache, source, target_format, options=options)
+                output_file = cache.fetch(key, output_folder, base_name)
+            if output_file is not None:
+                _step(progress, None, 1, 1)
+                return output_file
+
+        # 输出文件可能是指向缓存条目的硬链接，先删除再写入，避免改动缓存中的内容
+        files = output_files(target_format, output_folder, base_name)
+        for path in files:
+            if os.path.isfile(path):
+                os.remove(path)
+
+        output_file = _CONVERTERS[target_format](source, output_folder, base_name, progress, cancel,
+                                                 **params)
+        if cache is not None:
+            with metrics.stage("cache"):
+                cache.store(key, files, base_name)
+        return output_file
+
+
+def convert_to_memory(source, target_format, base_name=None, options=None):
+    """把源转换为内存中的字节，不写磁盘，返回 [(文件名, 字节)]，第一个为主输出文件
+
+    不使用输出缓存；其余参数与 convert() 相同。
+    """
+    if target_format not in _CONVERTERS:
+        raise ConversionError(f"不支持的目标格式: {target_format}")
+    if base_name is None:
+        base_name = default_base_name(source)
+    params = target_options(target_format, options)
+
+    with metrics.conversion(target_format, source if isinstance(source, str) else base_name):
+        _memory.files = files = {}
+        try:
+            _CONVERTERS[target_format](source, "", base_name, None, None, **params)
+        finally:
+            del _memory.files
+    names = [os.path.basename(path) for path in output_files(target_format, "", base_name)]
+    return [(name, files[name]) for name in names if name in files]
+
+
+def convert_many(source, targets, output_folder, base_name=None, guard_size=0, cancel=None,
+                 cache=None, options=None):
+    """源只解码一次，依次输出所有目标格式，返回 {目标格式: 输出路径}
+
+    使用输出缓存时，全部目标都命中则完全不解码源。
+    """
+    unknown = [t for t in targets if t not in _CONVERTERS]
+    if unknown:
+        raise ConversionError(f"不支持的目标格式: {','.join(unknown)}")
+
+    if base_name is None:
+        base_name = default_base_name(source)
+
+    results = {}
+    digest = None
+    if cache is not None:
+        digest = source_digest(source)
+        os.makedirs(output_folder, exist_ok=True)
+        for t in targets:
+            output_file = cache.fetch(cache_key(cache, source, t, guard_size, digest, options),
+                                      output_folder, base_name)
+            if output_file is not None:
+                results[t] = output_file
+
+    remaining = [t for t in targets if t not in results]
+    if remaining:
+        master = load_source(source, guard_size, digest, decode_size(remaining))
+        for t in remaining:
+            results[t] = convert(master, t, output_folder, base_name, cancel=cancel, cache=cache,
+                                 options=options)
+
+    return {t: results[t] for t in targets}
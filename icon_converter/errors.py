@@ -0,0 +1,6 @@
+class ConversionError(Exception):
+    """转换失败时抛出的异常"""
+
+
+class ConversionCancelled(ConversionError):
+    """转换被取消时抛出的异常"""
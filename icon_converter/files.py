@@ -0,0 +1,24 @@
+"""文件写入的辅助函数
+
+只依赖标准库，命令行解析参数时导入也不会拖慢启动。
+"""
+import os
+import tempfile
+
+
+def atomic_write(path, data):
+    """原子地把字节 data 写入 path：先写入同一目录下的临时文件再替换
+
+    并发读取不会读到不完整的内容，中途退出也不会留下损坏的文件；目录不存在时自动创建。
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,7 @@
+"""目标格式列表
+
+只有常量，不导入 PIL 或 Qt，命令行解析参数时不需要加载转换引擎。
+"""
+
+# 支持的目标格式
+TARGET_FORMATS = ("ico", "icns", "png", "favicon", "svg", "web")
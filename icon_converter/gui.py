@@ -0,0 +1,487 @@
+"""图形界面
+
+拖拽、粘贴或选择文件后转换为各种图标格式。各平台共用这一份代码，平台差异由 backends 模块处理，
+image_converter_macos.py 和 image_converter_windows.py 只是启动脚本。
+"""
+import os
+import sys
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+                            QPushButton, QLabel, QLineEdit, QFileDialog, QMessageBox, 
+                            QFrame, QSizePolicy, QMenu, QAction, QProgressBar,
+                            QListWidget, QListWidgetItem)
+from PyQt5.QtCore import Qt, QMimeData, QUrl
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QPixmap, QKeySequence, QImageReader
+from . import engine, batch, thumbnails
+from .backends import get_backend
+from .worker import ConversionTask, ConversionBatch, ConversionQueue
+from .manifest import BuildManifest
+
+# 预览图尺寸
+PREVIEW_SIZE = (100, 100)
+
+class DropArea(QFrame):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFrameStyle(QFrame.StyledPanel | QFrame.Sunken)
+        self.setAcceptDrops(True)
+        self.setMinimumHeight(150)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        
+        layout = QVBoxLayout(self)
+        self.label = QLabel("拖拽图片文件到这里或粘贴图片进行转换", self)
+        self.label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.label)
+        
+        self.image_preview = QLabel(self)
+        self.image_preview.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.image_preview)
+        
+        # 拖入多个文件或文件夹时显示待转换队列
+        self.queue_list = QListWidget(self)
+        self.queue_list.hide()
+        layout.addWidget(self.queue_list)
+        
+        self.file_path = None
+        # 待转换的文件：(源文件, 相对输出目录)，拖入文件夹时保持其目录结构
+        self.sources = []
+        # 拖入的文件夹：(文件夹路径, 输出子目录名)，用于增量转换
+        self.folders = []
+        self.queue_items = {}
+        # 从剪贴板粘贴的图像直接保存在内存中（engine.SourceImage），不写临时文件
+        self.pasted_image = None
+        
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+            
+    def dropEvent(self, event: QDropEvent):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            self.set_paths(paths)
+            
+    def set_paths(self, paths):
+        """设置待转换的文件和文件夹，文件夹会递归展开"""
+        self.sources = []
+        self.folders = []
+        for path in paths:
+            if os.path.isdir(path):
+                folder_name = os.path.basename(os.path.normpath(path))
+                self.folders.append((path, folder_name))
+                self.sources.extend(batch.iter_jobs(path, folder_name))
+            elif os.path.isfile(path):
+                self.sources.append((path, ""))
+        self.pasted_image = None
+        self.file_path = self.sources[0][0] if self.sources else None
+        
+        self.queue_list.clear()
+        self.queue_items = {}
+        if len(self.sources) > 1:
+            for source, _ in self.sources:
+                item = QListWidgetItem(os.path.basename(source), self.queue_list)
+                self.queue_items[source] = item
+            self.queue_list.show()
+        else:
+            self.queue_list.hide()
+        
+        self.update_preview()
+        if len(self.sources) > 1:
+            self.label.setText(f"已添加 {len(self.sources)} 个文件")
+            
+    def mark_status(self, source, status):
+        """在队列中标记文件的转换状态"""
+        item = self.queue_items.get(source)
+        if item is not None:
+            item.setText(f"{os.path.basename(source)}  —  {status}")
+            
+    def update_preview(self):
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                # 使用缩略图缓存，大图只做降采样解码，同一文件再次预览时直接读取缓存
+                try:
+                    pixmap = QPixmap(thumbnails.get_thumbnail(self.file_path, PREVIEW_SIZE))
+                except Exception:
+                    # PIL 无法解析的文件交给 Qt，按预览尺寸解码
+                    pixmap = self.read_scaled(self.file_path)
+                
+                self.show_preview(pixmap, os.path.basename(self.file_path))
+            except Exception as e:
+                self.label.setText(f"预览错误: {str(e)}")
+                self.image_preview.clear()
+                
+    def read_scaled(self, path):
+        reader = QImageReader(path)
+        size = reader.size()
+        if size.isValid():
+            size.scale(*PREVIEW_SIZE, Qt.KeepAspectRatio)
+            reader.setScaledSize(size)
+        return QPixmap.fromImage(reader.read())
+                
+    def show_preview(self, pixmap, title):
+        if not pixmap.isNull():
+            pixmap = pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.image_preview.setPixmap(pixmap)
+            self.label.setText(title)
+        else:
+            self.label.setText("无法预览图片")
+            self.image_preview.clear()
+                
+    def contextMenuEvent(self, event):
+        """处理右键菜单事件"""
+        context_menu = QMenu(self)
+        paste_action = QAction("粘贴", self)
+        paste_action.triggered.connect(self.paste_from_clipboard)
+        context_menu.addAction(paste_action)
+        context_menu.exec_(event.globalPos())
+        
+    def paste_from_clipboard(self):
+        """从剪贴板粘贴图像"""
+        clipboard = QApplication.clipboard()
+        mime_data = clipboard.mimeData()
+        
+        if mime_data.hasImage():
+            image = clipboard.image()
+            self.set_paths([])
+            self.pasted_image = engine.SourceImage(engine.qimage_to_pil(image), name="pasted_image")
+            self.show_preview(QPixmap.fromImage(image), "剪贴板图像")
+            # 更新主窗口的源文件输入框
+            if hasattr(self.window(), 'source_edit'):
+                self.window().source_edit.setText("")
+        elif mime_data.hasUrls():
+            paths = [url.toLocalFile() for url in mime_data.urls() if url.isLocalFile()]
+            if paths:
+                self.set_paths(paths)
+                # 更新主窗口的源文件输入框
+                if hasattr(self.window(), 'source_edit'):
+                    self.window().source_edit.setText(self.file_path or "")
+    
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Paste):
+            self.paste_from_clipboard()
+        else:
+            super().keyPressEvent(event)
+
+class IconConverter(QMainWindow):
+    def __init__(self, backend=None):
+        super().__init__()
+        self.backend = backend or get_backend()
+        self.initUI()
+        
+        # 自动填写输出文件夹为当前用户的桌面
+        self.output_edit.setText(self.backend.default_output_folder())
+        
+    def initUI(self):
+        self.setWindowTitle('图标格式互转工具')
+        self.setGeometry(100, 100, 600, 400)
+        
+        # 使窗口在屏幕中央显示
+        self.center()
+        
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        
+        main_layout = QVBoxLayout(central_widget)
+        
+        # 顶部文件选择部分
+        file_layout = QVBoxLayout()
+        
+        source_layout = QHBoxLayout()
+        source_label = QLabel("源文件:")
+        self.source_edit = QLineEdit()
+        source_browse = QPushButton("浏览...")
+        source_browse.clicked.connect(self.browse_source)
+        source_layout.addWidget(source_label)
+        source_layout.addWidget(self.source_edit)
+        source_layout.addWidget(source_browse)
+        
+        output_layout = QHBoxLayout()
+        output_label = QLabel("输出文件夹:")
+        self.output_edit = QLineEdit()
+        output_browse = QPushButton("浏览...")
+        output_browse.clicked.connect(self.browse_output)
+        output_layout.addWidget(output_label)
+        output_layout.addWidget(self.output_edit)
+        output_layout.addWidget(output_browse)
+        
+        file_layout.addLayout(source_layout)
+        file_layout.addLayout(output_layout)
+        
+        main_layout.addLayout(file_layout)
+        
+        # 中间按钮部分
+        button_layout = QHBoxLayout()
+        
+        self.ico_button = QPushButton("转换为ICO")
+        self.icns_button = QPushButton("转换为ICNS")
+        self.png_button = QPushButton("转换为PNG")
+        self.favicon_button = QPushButton("转换为Favicon")
+        self.svg_button = QPushButton("转换为SVG")
+        self.web_button = QPushButton("生成网页图标包")
+        
+        self.ico_button.clicked.connect(lambda: self.convert_image("ico"))
+        self.icns_button.clicked.connect(lambda: self.convert_image("icns"))
+        self.png_button.clicked.connect(lambda: self.convert_image("png"))
+        self.favicon_button.clicked.connect(lambda: self.convert_image("favicon"))
+        self.svg_button.clicked.connect(lambda: self.convert_image("svg"))
+        self.web_button.clicked.connect(lambda: self.convert_image("web"))
+        
+        button_layout.addWidget(self.ico_button)
+        button_layout.addWidget(self.icns_button)
+        button_layout.addWidget(self.png_button)
+        button_layout.addWidget(self.favicon_button)
+        button_layout.addWidget(self.svg_button)
+        button_layout.addWidget(self.web_button)
+        
+        main_layout.addLayout(button_layout)
+        
+        # 底部拖拽区域
+        self.drop_area = DropArea()
+        self.drop_area.setFocusPolicy(Qt.StrongFocus)
+        main_layout.addWidget(self.drop_area)
+        
+        # 初始化状态栏
+        self.statusBar().showMessage('准备就绪')
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(150)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.cancel_conversions)
+        self.cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_button)
+        
+        # 转换在后台线程池中执行
+        self.conversion_queue = ConversionQueue(self)
+        self.conversion_queue.pending_changed.connect(self.on_queue_changed)
+        
+    def center(self):
+        # 获取屏幕几何信息
+        screen = QApplication.desktop().screenGeometry()
+        # 获取窗口几何信息
+        size = self.geometry()
+        # 计算窗口居中时左上角的坐标
+        x = (screen.width() - size.width()) // 2
+        y = (screen.height() - size.height()) // 2
+        # 移动窗口到计算出的位置
+        self.move(x, y)
+
+    def keyPressEvent(self, event):
+        # 允许按Ctrl+V直接粘贴到应用程序中
+        if event.matches(QKeySequence.Paste):
+            self.drop_area.setFocus()
+            self.drop_area.keyPressEvent(event)
+        else:
+            super().keyPressEvent(event)
+            
+    def dragEnterEvent(self, event):
+        # 允许拖拽到整个窗口
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+            
+    def dropEvent(self, event):
+        # 处理拖拽到窗口的事件
+        self.drop_area.dropEvent(event)
+        self.source_edit.setText(self.drop_area.file_path or "")
+        
+    def browse_source(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择源文件", "", "图片文件 (*.png *.jpg *.jpeg *.bmp *.ico *.icns *.svg);;所有文件 (*)"
+        )
+        if file_path:
+            self.source_edit.setText(file_path)
+            self.drop_area.set_paths([file_path])
+            
+    def browse_output(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "选择输出文件夹")
+        if folder_path:
+            self.output_edit.setText(folder_path)
+            
+    def get_source_file(self):
+        # 优先使用粘贴的图像和拖拽区域的文件
+        if self.drop_area.pasted_image is not None:
+            return self.drop_area.pasted_image
+        if self.drop_area.file_path and os.path.exists(self.drop_area.file_path):
+            return self.drop_area.file_path
+        
+        # 其次使用源文件输入框的文件
+        source_path = self.source_edit.text()
+        if source_path and os.path.exists(source_path):
+            return source_path
+            
+        return None
+        
+    def get_conversion_jobs(self):
+        """返回待转换的 (源, 相对输出目录) 列表"""
+        if self.drop_area.pasted_image is not None:
+            return [(self.drop_area.pasted_image, "")]
+        if self.drop_area.sources:
+            jobs = [(source, rel_dir) for source, rel_dir in self.drop_area.sources
+                    if os.path.exists(source)]
+            if jobs:
+                return jobs
+        if self.drop_area.file_path and os.path.exists(self.drop_area.file_path):
+            return [(self.drop_area.file_path, "")]
+                
+        source_path = self.source_edit.text()
+        if source_path and os.path.isdir(source_path):
+            return list(batch.iter_jobs(source_path, os.path.basename(os.path.normpath(source_path))))
+        if source_path and os.path.exists(source_path):
+            return [(source_path, "")]
+        return []
+        
+    def get_source_folders(self):
+        """返回待转换的文件夹 (文件夹路径, 输出子目录名) 列表"""
+        if self.drop_area.pasted_image is not None:
+            return []
+        if self.drop_area.sources:
+            return self.drop_area.folders
+        source_path = self.source_edit.text()
+        if source_path and os.path.isdir(source_path):
+            return [(source_path, os.path.basename(os.path.normpath(source_path)))]
+        return []
+        
+    def open_manifests(self, jobs, output_folder, target_format):
+        """为每个文件夹打开增量清单，删除已删除源文件的输出，返回 (需要转换的任务, {任务: 清单})
+        
+        清单中记录为未改动的文件不再转换。只有遍历文件夹得到的任务才使用该文件夹的清单，
+        与文件夹一起拖入的单个文件即使位于其中，输出目录也不同，总是转换。
+        """
+        manifests = {}
+        for folder, folder_name in self.get_source_folders():
+            folder_jobs = [job for job in jobs if self._from_folder(job, folder, folder_name)]
+            manifest = BuildManifest(folder, os.path.join(output_folder, folder_name))
+            manifest.remove_orphans(source for source, _ in folder_jobs)
+            _, current = manifest.plan(folder_jobs, [target_format])
+            for source, rel_dir in current:
+                self.drop_area.mark_status(source, "未改动")
+            jobs = [job for job in jobs if job not in current]
+            manifests.update((job, manifest) for job in folder_jobs)
+        return jobs, manifests
+        
+    @staticmethod
+    def _from_folder(job, folder, folder_name):
+        """任务是否由 batch.iter_jobs(folder, folder_name) 遍历得到"""
+        source, rel_dir = job
+        if not isinstance(source, str):
+            return False
+        try:
+            rel = os.path.relpath(os.path.dirname(os.path.abspath(source)), os.path.abspath(folder))
+        except ValueError:
+            # Windows 上位于不同的驱动器
+            return False
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return False
+        return rel_dir == (folder_name if rel == os.curdir else os.path.join(folder_name, rel))
+
+    def get_output_folder(self):
+        output_folder = self.output_edit.text()
+        if not output_folder:
+            # 如果没有指定输出文件夹，使用源文件所在的文件夹
+            source_file = self.get_source_file()
+            if isinstance(source_file, str):
+                output_folder = os.path.dirname(source_file)
+            else:
+                output_folder = os.getcwd()
+                
+        # 确保输出文件夹存在
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+            
+        return output_folder
+    
+    def convert_image(self, target_format):
+        jobs = self.get_conversion_jobs()
+        if not jobs:
+            QMessageBox.warning(self, "警告", "请先选择或拖入源文件")
+            return
+            
+        output_folder = self.get_output_folder()
+        total = len(jobs)
+        jobs, manifests = self.open_manifests(jobs, output_folder, target_format)
+        if not jobs:
+            for manifest in set(manifests.values()):
+                manifest.save()
+            self.statusBar().showMessage(f'{total} 个文件均未改动，无需重新转换为{target_format.upper()}格式')
+            return
+        
+        tasks = []
+        for source, rel_dir in jobs:
+            task = ConversionTask(source, target_format, os.path.join(output_folder, rel_dir))
+            if (source, rel_dir) in manifests:
+                task.signals.finished.connect(
+                    lambda _, output, s=source, m=manifests[(source, rel_dir)]: m.record(s, {target_format: output}))
+            if isinstance(source, str):
+                self.drop_area.mark_status(source, "等待中")
+                task.signals.finished.connect(lambda *_, s=source: self.drop_area.mark_status(s, "完成"))
+                task.signals.error.connect(lambda *_, s=source: self.drop_area.mark_status(s, "失败"))
+                task.signals.cancelled.connect(lambda *_, s=source: self.drop_area.mark_status(s, "已取消"))
+            tasks.append(task)
+            
+        conversion_batch = ConversionBatch(target_format, tasks, self)
+        conversion_batch.progress.connect(self.on_conversion_progress)
+        conversion_batch.finished.connect(self.on_batch_finished)
+        for manifest in set(manifests.values()):
+            conversion_batch.finished.connect(lambda _, m=manifest: m.save())
+        
+        queued = self.conversion_queue.pending
+        self.conversion_queue.submit_batch(conversion_batch)
+        
+        if queued:
+            self.statusBar().showMessage(f'已加入队列: {target_format.upper()}（排队中 {queued} 个）')
+        elif len(tasks) > 1:
+            self.statusBar().showMessage(f'正在把 {len(tasks)} 个文件转换为{target_format.upper()}格式...')
+        else:
+            self.statusBar().showMessage(f'正在转换为{target_format.upper()}格式...')
+            
+    def on_conversion_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.progress_bar.show()
+        
+    def on_batch_finished(self, conversion_batch):
+        target_format = conversion_batch.target_format.upper()
+        conversion_batch.deleteLater()
+        
+        if len(conversion_batch.tasks) == 1:
+            if conversion_batch.outputs:
+                output_file = conversion_batch.outputs[0]
+                self.statusBar().showMessage(f'已成功转换为{target_format}格式: {output_file}')
+                QMessageBox.information(self, "成功", f"已成功转换为{target_format}格式\n保存在: {output_file}")
+            elif conversion_batch.errors:
+                message = conversion_batch.errors[0][1]
+                self.statusBar().showMessage(f'转换失败: {message}')
+                QMessageBox.critical(self, "错误", f"转换失败: {message}")
+            else:
+                self.statusBar().showMessage(f'已取消转换为{target_format}格式')
+            return
+            
+        # 多个文件时只在全部结束后汇总提示一次
+        summary = (f"{target_format}格式转换完成：成功 {len(conversion_batch.outputs)} 个，"
+                   f"失败 {len(conversion_batch.errors)} 个")
+        if conversion_batch.cancelled:
+            summary += f"，取消 {conversion_batch.cancelled} 个"
+        self.statusBar().showMessage(summary)
+        if conversion_batch.errors:
+            details = "\n".join(f"{name}: {message}" for name, message in conversion_batch.errors[:20])
+            QMessageBox.warning(self, "部分文件转换失败", f"{summary}\n\n{details}")
+        else:
+            QMessageBox.information(self, "完成", summary)
+        
+    def cancel_conversions(self):
+        self.conversion_queue.cancel_all()
+        self.statusBar().showMessage('正在取消...')
+        
+    def on_queue_changed(self, pending):
+        self.cancel_button.setVisible(pending > 0)
+        # 队列清空后隐藏进度条
+        if pending == 0:
+            self.progress_bar.hide()
+            self.progress_bar.reset()
+
+def main(backend=None):
+    """启动图形界面，返回退出码"""
+    backend = backend or get_backend()
+    app = QApplication(sys.argv)
+    backend.setup_application(app)
+    window = IconConverter(backend)
+    window.show()
+    return app.exec_()
@@ -0,0 +1,56 @@
+"""纯 Python 的 ICNS 编码器
+
+直接把各尺寸图像编码为 PNG 并写入 ICNS 容器，不依赖 iconutil，任何平台都能生成真正的 .icns 文件。
+
+ICNS 文件结构：
+    'icns' + 文件总长度(uint32, 大端)
+    若干数据块：类型(4字节) + 块长度(uint32, 含8字节块头) + 数据
+PNG 负载的块类型见 ICNS_TYPES。
+"""
+import struct
+
+from . import metrics
+from .pngopt import encode_png
+
+# 像素尺寸 -> 使用 PNG 负载的块类型（@2x 类型与 1x 类型共用同一份 PNG 数据）
+ICNS_TYPES = {
+    16: [b"icp4"],
+    32: [b"icp5", b"ic11"],
+    64: [b"icp6", b"ic12"],
+    128: [b"ic07"],
+    256: [b"ic08", b"ic13"],
+    512: [b"ic09", b"ic14"],
+    1024: [b"ic10"],
+}
+
+_HEADER_SIZE = 8
+
+
+def _block_header(block_type, data):
+    return block_type + struct.pack(">I", len(data) + _HEADER_SIZE)
+
+
+def _block(block_type, data):
+    """ICNS 数据块（与 PNG 的数据块格式不同：没有 CRC，长度含块头）"""
+    return _block_header(block_type, data) + data
+
+
+def build_icns(images):
+    """把 {边长: PIL 图像} 编码为 ICNS 字节；不在 ICNS_TYPES 中的尺寸会被忽略"""
+    entries = []
+    for size in sorted(images):
+        if size not in ICNS_TYPES:
+            continue
+        with metrics.stage("encode") as stage:
+            png_data = encode_png(images[size])
+            stage.add_bytes(len(png_data))
+        for block_type in ICNS_TYPES[size]:
+            entries.append((block_type, png_data))
+
+    if not entries:
+        raise ValueError("没有可写入ICNS的尺寸")
+
+    # 目录块（TOC）列出每个数据块的类型和长度，便于读取方快速定位
+    toc = b"".join(_block_header(block_type, data) for block_type, data in entries)
+    body = _block(b"TOC ", toc) + b"".join(_block(t, d) for t, d in entries)
+    return b"icns" + struct.pack(">I", len(body) + _HEADER_SIZE) + body
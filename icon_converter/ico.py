@@ -0,0 +1,143 @@
+"""纯 Python 的 ICO 编码器
+
+PIL 把 ICO 中的每个尺寸都编码为 32 位 RGBA 的 PNG。这里为每个尺寸分别选择最小的编码：
+
+    BMP（DIB）  只用于不超过 BMP_MAX_SIZE 的小尺寸，所有版本的 Windows 都能读取；
+                透明度只有全透明和不透明两种且颜色不超过 256 种时使用 1/4/8 位调色板，否则为 32 位 BGRA
+    PNG        完全不透明时使用调色板 PNG（颜色不超过 256 种）或 RGB PNG，否则为 RGBA PNG
+
+调色板编码是无损的，只在图像本来就只有这么多颜色时使用。
+有透明度的 PNG 不使用调色板加透明度表（tRNS）：PIL 读取 ICO 时会丢掉 PNG 的 tRNS，
+本工具读取 ICO 源、生成缩略图也经过 PIL，图像会变为不透明。
+
+ICO 文件结构（小端）：
+    文件头：保留(uint16) + 类型 1(uint16) + 图像数(uint16)
+    目录项：宽、高(uint8，256 记为 0) + 颜色数(uint8) + 保留(uint8) + 位面数(uint16)
+            + 位深(uint16) + 数据长度(uint32) + 数据偏移(uint32)
+    各图像的数据：BMP 为 BITMAPINFOHEADER（高度为两倍）+ 调色板 + 自下而上的像素 + 1 位 AND 掩码
+"""
+import struct
+from collections import namedtuple
+
+from PIL import Image
+
+from . import metrics
+from .pngopt import encode_png, optimize_png, palette_bits, png_bits, to_palette
+
+# 不超过该边长的尺寸才考虑 BMP 编码
+BMP_MAX_SIZE = 48
+# ICO 目录项能表示的最大边长
+MAX_SIZE = 256
+
+_HEADER = struct.Struct("<HHH")
+_ENTRY = struct.Struct("<BBBBHHII")
+_BITMAP_INFO = struct.Struct("<IiiHHIIiiII")
+
+# 每个尺寸的编码结果：尺寸、编码（"bmp"、"png"）、位深、字节数
+IcoFrame = namedtuple('IcoFrame', ['size', 'format', 'bits', 'bytes'])
+# frames 为各尺寸的编码结果，size 为文件大小，baseline 为全部使用 32 位 PNG（PIL 的编码）时的文件大小
+IcoReport = namedtuple('IcoReport', ['frames', 'size', 'baseline'])
+
+
+def _is_binary_alpha(alpha):
+    """透明度只有 0 和 255 两种取值"""
+    return not any(alpha.histogram()[1:255])
+
+
+def _palette_png(indexed, entries):
+    """把 pngopt.to_palette() 的结果编码为调色板 PNG，只用于完全不透明的图像"""
+    return encode_png(indexed, bits=palette_bits(len(entries)))
+
+
+def _mask_rows(alpha):
+    """1 位 AND 掩码，全透明的像素为 1，自下而上，每行补齐到 4 字节"""
+    mask = alpha.point(lambda a: 255 if a == 0 else 0).convert('1')
+    return mask.tobytes('raw', '1', (alpha.width + 31) // 32 * 4, -1)
+
+
+def _bmp(img, alpha):
+    """编码为 ICO 中的 DIB，返回 (位深, 调色板颜色数, 字节)"""
+    width, height = img.size
+    mask = _mask_rows(alpha)
+    palette = b""
+    count = 0
+    indexed = None
+    if _is_binary_alpha(alpha):
+        # 全透明的像素在 AND 掩码中为 1，颜色必须为黑色，否则旧的绘制方式会与背景异或
+        rgb = Image.new('RGB', img.size, (0, 0, 0))
+        rgb.paste(img.convert('RGB'), mask=alpha)
+        indexed = to_palette(rgb)
+    if indexed is not None:
+        indexed, entries = indexed
+        count = len(entries)
+        bits = 1 if count <= 2 else 4 if count <= 16 else 8
+        rawmode = 'P' if bits == 8 else f'P;{bits}'
+        pixels = indexed.tobytes('raw', rawmode, (width * bits + 31) // 32 * 4, -1)
+        palette = b"".join(bytes((b, g, r, 0)) for r, g, b, _ in entries)
+    else:
+        bits = 32
+        pixels = img.convert('RGBA').tobytes('raw', 'BGRA', 0, -1)
+
+    header = _BITMAP_INFO.pack(_BITMAP_INFO.size, width, height * 2, 1, bits, 0,
+                               len(pixels) + len(mask), 0, 0, count, 0)
+    return bits, count, header + palette + pixels + mask
+
+
+def encode_frame(img, optimize=False):
+    """为一个尺寸选择最小的编码，返回 (格式, 位深, 调色板颜色数, 字节, PIL 默认编码的字节数)
+
+    optimize 为 True 时 PNG 使用 pngopt 搜索最小的编码，否则只尝试调色板和 RGB；
+    两者都只在完全不透明时使用调色板，见模块说明。
+    """
+    with metrics.stage("encode") as stage:
+        if 'transparency' in img.info:
+            # P、L、RGB 模式的透明色也会写成 tRNS，见模块说明
+            img = img.convert('RGBA')
+        baseline = encode_png(img)
+        best = ("png", 24 if img.mode == 'RGB' else 32, 0, baseline)
+        rgba = img.convert('RGBA')
+        alpha = rgba.getchannel('A')
+        opaque = alpha.getextrema() == (255, 255)
+        candidates = []
+        if optimize:
+            data, _ = optimize_png(img, trns=False)
+            candidates.append(("png", png_bits(data), 0, data))
+        elif opaque:
+            palette = to_palette(rgba.convert('RGB'))
+            if palette is not None:
+                candidates.append(("png", 8, 0, _palette_png(*palette)))
+            elif img.mode != 'RGB':
+                candidates.append(("png", 24, 0, encode_png(rgba.convert('RGB'))))
+        if max(img.size) <= BMP_MAX_SIZE:
+            candidates.append(("bmp", *_bmp(rgba, alpha)))
+        for candidate in candidates:
+            if len(candidate[3]) < len(best[3]):
+                best = candidate
+        stage.add_bytes(len(best[3]))
+    return best + (len(baseline),)
+
+
+def build_ico(images, optimize=False):
+    """把各尺寸的 PIL 图像编码为 ICO 字节，返回 (字节, IcoReport)；超过 256 的尺寸会被忽略
+
+    optimize 为 True 时 PNG 编码的尺寸经过体积优化（见 pngopt 模块）。
+    """
+    images = sorted((img for img in images if max(img.size) <= MAX_SIZE), key=lambda img: img.size)
+    if not images:
+        raise ValueError("没有可写入ICO的尺寸")
+
+    offset = _HEADER.size + _ENTRY.size * len(images)
+    entries, payloads, frames = [], [], []
+    baseline = offset
+    for img in images:
+        format, bits, count, data, png_size = encode_frame(img, optimize)
+        width, height = img.size
+        entries.append(_ENTRY.pack(width % MAX_SIZE, height % MAX_SIZE, count % 256, 0, 1,
+                                   bits if format == "bmp" else 32, len(data), offset))
+        payloads.append(data)
+        frames.append(IcoFrame(img.size, format, bits, len(data)))
+        offset += len(data)
+        baseline += png_size
+
+    data = _HEADER.pack(0, 1, len(images)) + b"".join(entries) + b"".join(payloads)
+    return data, IcoReport(frames, len(data), baseline)
@@ -0,0 +1,147 @@
+"""增量转换清单
+
+目录转换时在输出目录中保存一个清单文件，记录每个源文件的修改时间、大小、内容哈希以及生成的输出文件。
+再次转换同一目录时只重新转换有改动的源文件，源文件已被删除的输出也会一并删除。
+
+判断源文件是否改动时先比较修改时间和大小，不同时再比较内容哈希，
+只是被 touch 过的文件不会被重新转换。
+"""
+import os
+import json
+
+from . import engine
+from .files import atomic_write
+
+MANIFEST_NAME = ".icon_converter_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _normalize(settings):
+    # 元组经过 JSON 后变为列表，统一格式后再比较
+    return json.loads(json.dumps(settings))
+
+
+class BuildManifest:
+    """一个源目录到一个输出目录的转换清单
+
+    源文件以相对 source_root 的路径为键，输出文件以相对 output_folder 的路径记录，
+    整个目录树移动后清单依然有效。
+    """
+
+    def __init__(self, source_root, output_folder):
+        self.source_root = source_root
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # 没有清单或清单已损坏，按全部需要转换处理
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("sources", {})
+
+    def save(self):
+        """原子地写入清单，中途退出不会留下损坏的清单"""
+        data = json.dumps({"version": MANIFEST_VERSION, "sources": self.entries},
+                          ensure_ascii=False, sort_keys=True)
+        atomic_write(self.path, data.encode('utf-8'))
+
+    def _source_key(self, source):
+        return os.path.relpath(source, self.source_root).replace(os.sep, '/')
+
+    def _source_path(self, key):
+        return os.path.join(self.source_root, *key.split('/'))
+
+    def _output_path(self, rel_path):
+        return os.path.join(self.output_folder, *rel_path.split('/'))
+
+    def _output_key(self, path):
+        return os.path.relpath(path, self.output_folder).replace(os.sep, '/')
+
+    def is_current(self, source, targets, guard_size=0, options=None):
+        """源文件未改动，且各目标格式都已按相同设置生成并且输出文件仍然存在"""
+        entry = self.entries.get(self._source_key(source))
+        if entry is None:
+            return False
+
+        for target_format in targets:
+            record = entry["targets"].get(target_format)
+            if record is None or record["settings"] != _normalize(
+                    engine.target_settings(target_format, guard_size, options)):
+                return False
+            if not all(os.path.isfile(self._output_path(p)) for p in record["files"]):
+                return False
+
+        stat = os.stat(source)
+        if stat.st_mtime_ns == entry["mtime_ns"] and stat.st_size == entry["size"]:
+            return True
+        if stat.st_size != entry["size"] or engine.source_digest(source) != entry["sha256"]:
+            return False
+        # 内容没变，只是修改时间变了，更新记录以便下次直接命中
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def plan(self, jobs, targets, guard_size=0, options=None):
+        """把 (源文件, 输出文件夹) 列表分为需要转换和可以跳过的两部分"""
+        stale, current = [], []
+        for job in jobs:
+            (current if self.is_current(job[0], targets, guard_size, options) else stale).append(job)
+        return stale, current
+
+    def record(self, source, outputs, guard_size=0, options=None):
+        """记录源文件的一次转换结果，outputs 为 {目标格式: 主输出文件路径}"""
+        stat = os.stat(source)
+        digest = engine.source_digest(source)
+        key = self._source_key(source)
+        entry = self.entries.get(key)
+        if entry is None or entry["sha256"] != digest:
+            # 源内容变了，之前其他目标格式的记录也随之失效
+            entry = {"targets": {}}
+            self.entries[key] = entry
+        entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=digest)
+
+        base_name = engine.default_base_name(source)
+        for target_format, output_file in outputs.items():
+            files = engine.output_files(target_format, os.path.dirname(output_file), base_name)
+            entry["targets"][target_format] = {
+                "settings": _normalize(engine.target_settings(target_format, guard_size, options)),
+                "files": [self._output_key(f) for f in files],
+            }
+
+    def remove_orphans(self, sources):
+        """删除已不在 sources 中的源文件的全部输出，返回被删除的输出文件列表"""
+        live = {self._source_key(s) for s in sources}
+        return self._remove_entries([k for k in self.entries if k not in live])
+
+    def remove_missing(self):
+        """删除源文件已不存在的全部输出，不需要重新遍历源目录，返回被删除的输出文件列表"""
+        return self._remove_entries([k for k in self.entries
+                                     if not os.path.isfile(self._source_path(k))])
+
+    def _remove_entries(self, keys):
+        removed = []
+        for key in keys:
+            for record in self.entries.pop(key)["targets"].values():
+                for rel_path in record["files"]:
+                    path = self._output_path(rel_path)
+                    if os.path.isfile(path):
+                        os.remove(path)
+                        removed.append(path)
+                    self._remove_empty_dirs(os.path.dirname(path))
+        return removed
+
+    def _remove_empty_dirs(self, folder):
+        root = os.path.abspath(self.output_folder)
+        folder = os.path.abspath(folder)
+        while folder != root and folder.startswith(root + os.sep):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                # 目录不为空
+                break
+            folder = os.path.dirname(folder)
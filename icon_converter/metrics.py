@@ -0,0 +1,264 @@
+"""分阶段耗时统计
+
+记录每次转换中解码（decode）、SVG 渲染（svg_render）、缩放（resize）、描摹（trace）、编码（encode）、
+写文件（write）以及输出缓存（cache）等各阶段的耗时和字节数。每次转换结束时输出一行 JSON，
+同时按 (阶段, 目标格式) 累计，可以导出为 Prometheus 文本格式。
+转换中还可以用 annotate() 附加字段，例如 ICO 和优化后的 PNG 相对 PIL 默认编码节省的字节数（saved_bytes），按目标格式累计。
+
+默认关闭，关闭时 stage() 只做一次全局变量判断并返回共享的空上下文，没有额外开销。
+enable() 打开统计；设置环境变量 ICON_CONVERTER_METRICS=<文件> 时，导入时即打开并把 JSON 行写入该文件，
+图形界面也可以这样开启。
+
+多进程时，工作进程以 collect=True 打开统计，把记录随结果交回主进程，由主进程统一汇总和输出。
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+from .files import atomic_write
+
+# 环境变量：JSON 行日志的路径，"-" 表示标准错误
+ENV_VAR = "ICON_CONVERTER_METRICS"
+
+# 当前的统计器，为 None 时统计关闭
+_recorder = None
+
+
+class _NullStage:
+    """统计关闭时使用的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_bytes(self, nbytes):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, recorder, name, nbytes):
+        self.recorder = recorder
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.stage_done(self.name, time.perf_counter() - self.start, self.nbytes,
+                                 exc_type is None)
+        return False
+
+    def add_bytes(self, nbytes):
+        self.nbytes += nbytes
+
+
+class _Conversion:
+    def __init__(self, recorder, target_format, source):
+        self.recorder = recorder
+        self.record = {"target": target_format, "source": source, "stages": []}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.recorder.push(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        from .errors import ConversionCancelled
+        self.recorder.pop()
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, ConversionCancelled):
+            status = "cancelled"
+        else:
+            status = "error"
+        self.record.update(status=status, seconds=time.perf_counter() - self.start,
+                           time=time.time())
+        self.recorder.add(self.record)
+        return False
+
+    def add_bytes(self, nbytes):
+        pass
+
+
+class MetricsRecorder:
+    """收集转换记录并按 (阶段, 目标格式) 累计
+
+    log_path 为 JSON 行日志的路径（"-" 为标准错误），为空时不写日志；
+    collect 为 True 时保留记录，供 drain() 取走后交给其他进程。
+    """
+
+    def __init__(self, log_path=None, collect=False):
+        self.log_path = log_path
+        self.collect = collect
+        # (阶段, 目标格式) -> [次数, 秒数, 字节数]
+        self.stages = {}
+        # (目标格式, 状态) -> 次数
+        self.conversions = {}
+        # 目标格式 -> 节省的字节数
+        self.saved = {}
+        self._collected = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def push(self, record):
+        self._stack().append(record)
+
+    def pop(self):
+        self._stack().pop()
+
+    def annotate(self, fields):
+        stack = self._stack()
+        if stack:
+            record = stack[-1]
+            for name, value in fields.items():
+                if isinstance(value, (int, float)) and name in record:
+                    record[name] += value
+                else:
+                    record[name] = value
+
+    def stage_done(self, name, seconds, nbytes, ok=True):
+        stage = {"stage": name, "seconds": seconds, "bytes": nbytes}
+        stack = self._stack()
+        if stack:
+            stack[-1]["stages"].append(stage)
+        else:
+            # 不属于任何一次转换的阶段（例如批量转换中共用的解码）单独记录
+            self.add({"target": None, "source": None, "stages": [stage],
+                      "status": "ok" if ok else "error",
+                      "seconds": seconds, "time": time.time()})
+
+    def add(self, record):
+        """累计一条转换记录并写入日志，也用于汇总工作进程交回的记录"""
+        line = json.dumps(record, ensure_ascii=False)
+        target = record["target"] or ""
+        with self._lock:
+            for stage in record["stages"]:
+                totals = self.stages.setdefault((stage["stage"], target), [0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += stage["seconds"]
+                totals[2] += stage["bytes"]
+            if record["target"] is not None:
+                key = (target, record["status"])
+                self.conversions[key] = self.conversions.get(key, 0) + 1
+            if record.get("saved_bytes"):
+                self.saved[target] = self.saved.get(target, 0) + record["saved_bytes"]
+            if self.collect:
+                self._collected.append(record)
+            if self.log_path == "-":
+                print(line, file=sys.stderr)
+            elif self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+
+    def drain(self):
+        """取走已收集的记录"""
+        with self._lock:
+            records, self._collected = self._collected, []
+        return records
+
+    def prometheus(self):
+        """导出为 Prometheus 文本格式"""
+        lines = [
+            "# HELP icon_converter_stage_seconds_total 各阶段累计耗时（秒）",
+            "# TYPE icon_converter_stage_seconds_total counter",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            conversions = sorted(self.conversions.items())
+            saved = sorted(self.saved.items())
+        for (stage, target), (_, seconds, _) in stages:
+            lines.append(f'icon_converter_stage_seconds_total{{stage="{stage}",target="{target}"}} {seconds:.6f}')
+        lines += ["# HELP icon_converter_stage_calls_total 各阶段执行次数",
+                  "# TYPE icon_converter_stage_calls_total counter"]
+        for (stage, target), (count, _, _) in stages:
+            lines.append(f'icon_converter_stage_calls_total{{stage="{stage}",target="{target}"}} {count}')
+        lines += ["# HELP icon_converter_stage_bytes_total 各阶段处理的字节数",
+                  "# TYPE icon_converter_stage_bytes_total counter"]
+        for (stage, target), (_, _, nbytes) in stages:
+            lines.append(f'icon_converter_stage_bytes_total{{stage="{stage}",target="{target}"}} {nbytes}')
+        lines += ["# HELP icon_converter_conversions_total 转换次数",
+                  "# TYPE icon_converter_conversions_total counter"]
+        for (target, status), count in conversions:
+            lines.append(f'icon_converter_conversions_total{{target="{target}",status="{status}"}} {count}')
+        lines += ["# HELP icon_converter_saved_bytes_total 相对 PIL 默认编码节省的输出字节数",
+                  "# TYPE icon_converter_saved_bytes_total counter"]
+        for target, nbytes in saved:
+            lines.append(f'icon_converter_saved_bytes_total{{target="{target}"}} {nbytes}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """原子地写入 Prometheus 文本文件（可供 node_exporter 的 textfile 收集器读取）"""
+        atomic_write(path, self.prometheus().encode('utf-8'))
+
+
+def enable(log_path=None, collect=False):
+    """打开统计，返回新的统计器"""
+    global _recorder
+    _recorder = MetricsRecorder(log_path, collect)
+    return _recorder
+
+
+def disable():
+    global _recorder
+    _recorder = None
+
+
+def enabled():
+    return _recorder is not None
+
+
+def recorder():
+    return _recorder
+
+
+def stage(name, nbytes=0):
+    """统计一个阶段的耗时：with metrics.stage("encode") as s: ...; s.add_bytes(n)"""
+    if _recorder is None:
+        return _NULL_STAGE
+    return _Stage(_recorder, name, nbytes)
+
+
+def conversion(target_format, source=None):
+    """统计一次转换，其中的各阶段归入这次转换的记录"""
+    if _recorder is None:
+        return _NULL_STAGE
+    return _Conversion(_recorder, target_format, source)
+
+
+def annotate(**fields):
+    """给当前这次转换的记录附加字段，已有的数值字段累加；不在转换中或统计关闭时忽略"""
+    if _recorder is not None:
+        _recorder.annotate(fields)
+
+
+def drain():
+    """取走工作进程中收集的记录，统计关闭时返回空列表"""
+    if _recorder is None or not _recorder.collect:
+        return []
+    return _recorder.drain()
+
+
+def add(records):
+    """把工作进程交回的记录并入当前统计器"""
+    if _recorder is not None:
+        for record in records or ():
+            _recorder.add(record)
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
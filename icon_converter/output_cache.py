@@ -0,0 +1,152 @@
+"""按内容寻址的输出缓存
+
+以 (源内容哈希, 目标格式, 尺寸等设置, 引擎版本) 为键保存转换产物。命中时直接把缓存中的文件
+硬链接（跨磁盘时复制）到输出文件夹，不再解码和转换。缓存总大小有上限，超出时按最近最少使用淘汰。
+
+每个缓存条目是缓存目录下的一个子目录：
+    entry.json      产物的后缀列表，第一个为主输出文件
+    a<后缀>         产物文件，例如 a.ico、a_favicon.png
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+from .backends import user_cache_dir
+
+OUTPUT_CACHE_DIR = user_cache_dir("outputs")
+# 默认容量 1 GB
+OUTPUT_CACHE_BYTES = 1024 * 1024 * 1024
+
+_ENTRY_FILE = "entry.json"
+_ARTIFACT_PREFIX = "a"
+
+# 缓存目录 -> 本进程估计的总大小（字节）。第一次写入时扫描一次，之后只累加本进程写入的条目，
+# 超出上限时 evict() 重新扫描得到准确值；其他进程写入的条目在下次扫描时才计入
+_estimated_bytes = {}
+
+
+class OutputCache:
+    """转换产物缓存
+
+    link 为 True 时命中的文件以硬链接方式放入输出文件夹，否则复制。
+    """
+
+    def __init__(self, cache_dir=OUTPUT_CACHE_DIR, max_bytes=OUTPUT_CACHE_BYTES, link=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+
+    @staticmethod
+    def entry_key(digest, target_format, settings):
+        """由源内容哈希、目标格式和转换设置计算条目键"""
+        payload = json.dumps([digest, target_format, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, output_folder, base_name):
+        """命中时把产物放入输出文件夹并返回主输出文件路径，未命中返回 None"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, _ENTRY_FILE), encoding='utf-8') as f:
+                suffixes = json.load(f)["suffixes"]
+            outputs = []
+            for suffix in suffixes:
+                output_file = os.path.join(output_folder, f"{base_name}{suffix}")
+                self._place(os.path.join(entry_dir, _ARTIFACT_PREFIX + suffix), output_file)
+                outputs.append(output_file)
+            # 更新修改时间，作为 LRU 淘汰的依据
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError):
+            # 条目不存在、不完整或正被其他进程淘汰，都按未命中处理
+            return None
+        return outputs[0]
+
+    def _place(self, cached_file, output_file):
+        if os.path.lexists(output_file):
+            os.remove(output_file)
+        if self.link:
+            try:
+                os.link(cached_file, output_file)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(cached_file, output_file)
+
+    def store(self, key, output_files, base_name):
+        """保存一次转换的全部产物，output_files 的第一个为主输出文件"""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+
+        # 先写入临时目录，完整后再改名，其他进程不会读到半个条目
+        temp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry_dir))
+        try:
+            suffixes = []
+            nbytes = 0
+            for output_file in output_files:
+                suffix = os.path.basename(output_file)[len(base_name):]
+                shutil.copyfile(output_file, os.path.join(temp_dir, _ARTIFACT_PREFIX + suffix))
+                suffixes.append(suffix)
+                nbytes += os.path.getsize(output_file)
+            with open(os.path.join(temp_dir, _ENTRY_FILE), 'w', encoding='utf-8') as f:
+                json.dump({"suffixes": suffixes}, f)
+                nbytes += f.tell()
+            os.replace(temp_dir, entry_dir)
+        except OSError:
+            # 其他进程已经写入了同一条目
+            return
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self._added(nbytes)
+
+    def _added(self, nbytes):
+        """累加新写入条目的大小，估计的总大小超过上限时才扫描并淘汰"""
+        total = _estimated_bytes.get(self.cache_dir)
+        if total is None:
+            # 扫描结果已经包含刚写入的条目
+            total = self.total_bytes
+        else:
+            total += nbytes
+        _estimated_bytes[self.cache_dir] = total
+        if total > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """返回 [(最近使用时间, 占用字节数, 条目目录)]"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_dir() or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        """总大小超过上限时，从最久未使用的条目开始删除"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        _estimated_bytes[self.cache_dir] = total
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
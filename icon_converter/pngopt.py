@@ -0,0 +1,302 @@
+"""PNG 体积优化
+
+类似 oxipng，但不依赖外部程序：对同一图像尝试多种无损编码，保留最小的结果。
+
+1. 颜色类型缩减：不透明的 RGBA 去掉透明通道，灰色的 RGB 存为灰度；
+   颜色不超过 256 种时另外尝试调色板（1/2/4/8 位，带透明度表 tRNS）；
+2. 行过滤：每行都不过滤（None）、都用 Sub、都用 Up，以及 PIL 的逐行自适应过滤；
+3. 压缩：zlib 的默认、FILTERED、RLE 三种策略。
+
+候选很多，先全部用较快的压缩级别试压一遍，只把最小的几个用最高级别重新压缩。
+自行编码的候选用 PIL 的 ImageChops 计算过滤后的数据，各候选在线程池中压缩（zlib 压缩时释放 GIL）。
+输出只包含 IHDR、iCCP、PLTE、tRNS、IDAT、IEND，文本、EXIF、时间等元数据全部去掉；
+ICC 颜色配置影响显示的颜色，予以保留。
+"""
+import io
+import os
+import zlib
+import struct
+import functools
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops
+
+# 参与比较的 zlib 策略（PIL 的 compress_type 与 zlib 策略的取值相同）
+STRATEGIES = {"default": zlib.Z_DEFAULT_STRATEGY, "filtered": zlib.Z_FILTERED, "rle": zlib.Z_RLE}
+# 试压的压缩级别（1～3 级不区分策略，不能用于比较），以及试压后用最高级别重新压缩的候选数
+TRIAL_LEVEL = 5
+FINALISTS = 3
+# 原始数据超过该字节数时，只截取中间约 TRIAL_SAMPLE_BYTES 的一段试压，最终压缩使用 6 级：
+# 照片等大图用 9 级要慢好几倍，体积只小千分之几
+SEARCH_MAX_BYTES = 4 * 1024 * 1024
+TRIAL_SAMPLE_BYTES = 1024 * 1024
+# 原始数据超过该字节数时不做优化，直接使用 PIL 的默认编码
+OPTIMIZE_MAX_BYTES = 64 * 1024 * 1024
+# PIL 量化的结果与原图不完全相同时，不超过该像素数的图像逐个像素查表转换为调色板
+LOOKUP_MAX_PIXELS = 1024 * 1024
+
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG 行过滤类型
+_FILTERS = {"none": 0, "sub": 1, "up": 2}
+# PIL 模式 -> PNG 颜色类型
+_COLOR_TYPES = {"L": 0, "RGB": 2, "P": 3, "LA": 4, "RGBA": 6}
+
+# size 为优化后的字节数，baseline 为 PIL 默认设置编码的字节数，method 为胜出的编码方式
+PngReport = namedtuple('PngReport', ['size', 'baseline', 'method'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """各次优化共用的线程池，首次使用时创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                           thread_name_prefix="pngopt")
+        return _executor
+
+
+def png_bits(data):
+    """PNG 数据每个像素的位数（位深 × 通道数）"""
+    depth, color_type = data[24], data[25]
+    return depth * {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color_type]
+
+
+def palette_bits(count):
+    """count 种颜色的调色板所需的位深"""
+    for bits in (1, 2, 4):
+        if count <= 1 << bits:
+            return bits
+    return 8
+
+
+def encode_png(img, **params):
+    """用 PIL 把图像编码为 PNG 字节，params 为 PIL 的 PNG 保存参数；各模块的 PNG 编码都经过这里"""
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', **params)
+    return buffer.getvalue()
+
+
+def to_palette(img):
+    """颜色不超过 256 种时无损地转换为 P 模式，返回 (P 模式图像, 各调色板项的 RGBA 颜色)；否则返回 None
+
+    调色板按不透明度从低到高排列，PNG 的 tRNS 可以省略末尾不透明的项。
+    """
+    # 先统一为 RGB/RGBA，颜色表与下面查表用的像素才是同一种格式（L、LA 的颜色只有一两个通道）
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    colors = img.getcolors(256)
+    if colors is None:
+        return None
+    # 先用 PIL 量化并检查结果，量化算法在颜色数不超过目标数时通常是精确的，但不能保证
+    indexed = None
+    methods = [Image.Quantize.FASTOCTREE] + ([Image.Quantize.MEDIANCUT] if img.mode == 'RGB' else [])
+    for method in methods:
+        candidate = img.quantize(len(colors), method=method, dither=Image.Dither.NONE)
+        # RGBA 图像的 getbbox() 默认只看透明通道
+        if ImageChops.difference(candidate.convert(img.mode), img).getbbox(alpha_only=False) is None:
+            indexed = candidate
+            break
+    if indexed is None:
+        if img.width * img.height > LOOKUP_MAX_PIXELS:
+            return None
+        channels = len(img.mode)
+        lookup = {bytes(color): index for index, (_, color) in enumerate(colors)}
+        data = img.tobytes()
+        indexed = Image.frombytes('P', img.size, bytes(lookup[data[offset:offset + channels]]
+                                                       for offset in range(0, len(data), channels)))
+        entries = [color for _, color in colors]
+    else:
+        # P 模式的 getextrema() 给出的不是编号的范围，用直方图找出用到的最大编号
+        histogram = indexed.histogram()
+        count = max(index for index, n in enumerate(histogram) if n) + 1
+        palette = indexed.getpalette('RGBA' if img.mode == 'RGBA' else 'RGB')
+        channels = len(img.mode)
+        entries = [tuple(palette[i:i + channels]) for i in range(0, count * channels, channels)]
+    entries = [color + (255,) * (4 - len(color)) for color in entries]
+
+    # 按不透明度排序并重新编号
+    order = sorted(range(len(entries)), key=lambda index: entries[index][3])
+    remap = [0] * 256
+    for position, index in enumerate(order):
+        remap[index] = position
+    indexed = indexed.point(remap)
+    entries = [entries[index] for index in order]
+    indexed.putpalette([channel for color in entries for channel in color[:3]])
+    return indexed, entries
+
+
+def _reduce(img):
+    """无损地缩减颜色类型，返回 L、LA、RGB、RGBA 之一；不支持的模式返回 None"""
+    if img.mode == 'P':
+        # 调色板本身可能带透明度，先转换为 RGBA，完全不透明时下面再去掉透明通道
+        img = img.convert('RGBA')
+    elif img.mode not in _COLOR_TYPES:
+        return None
+    if img.mode in ('RGBA', 'LA') and img.getchannel('A').getextrema() == (255, 255):
+        img = img.convert(img.mode[:-1])
+    if img.mode in ('RGB', 'RGBA'):
+        r, g, b = img.getchannel('R'), img.getchannel('G'), img.getchannel('B')
+        if ImageChops.difference(r, g).getbbox() is None and ImageChops.difference(r, b).getbbox() is None:
+            img = img.convert('LA' if img.mode == 'RGBA' else 'L')
+    return img
+
+
+def _filtered(img, kind):
+    """整幅图像使用同一种行过滤时，每行带过滤类型字节的原始数据"""
+    if kind == "none":
+        data = img.tobytes()
+    else:
+        width, height = img.size
+        # 左边（上边）的像素，超出图像的部分为 0
+        if kind == "sub":
+            previous = ImageChops.offset(img, 1, 0)
+            previous.paste(0, (0, 0, 1, height))
+        else:
+            previous = ImageChops.offset(img, 0, 1)
+            previous.paste(0, (0, 0, width, 1))
+        data = ImageChops.subtract_modulo(img, previous).tobytes()
+    return _rows(data, img.height, _FILTERS[kind])
+
+
+def _rows(data, height, filter_type):
+    stride = len(data) // height
+    prefix = bytes((filter_type,))
+    view = memoryview(data)
+    return b"".join(prefix + view[offset:offset + stride] for offset in range(0, len(data), stride))
+
+
+def _compress(raw, strategy, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, STRATEGIES[strategy])
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _encode_filtered(img, kind, strategy, icc_profile, level, box=None):
+    """按指定的行过滤和策略编码 L、LA、RGB、RGBA 图像；box 不为空时只编码其中的区域（用于试压）"""
+    if box is not None:
+        img = img.crop(box)
+    return _container(img, 8, _compress(_filtered(img, kind), strategy, level), icc_profile=icc_profile)
+
+
+def _encode_indexed(indexed, bits, entries, kind, strategy, icc_profile, level, box=None):
+    """编码 to_palette() 得到的调色板图像"""
+    if box is not None:
+        indexed = indexed.crop(box)
+    if bits == 8:
+        # 调色板编号按灰度图过滤，字节相同
+        raw = _filtered(Image.frombytes('L', indexed.size, indexed.tobytes()), kind)
+    else:
+        raw = _rows(indexed.tobytes('raw', f'P;{bits}'), indexed.height, _FILTERS[kind])
+    plte = bytes(channel for color in entries for channel in color[:3])
+    # tRNS 末尾不透明的项可以省略
+    alphas = bytes(color[3] for color in entries).rstrip(b"\xff")
+    return _container(indexed, bits, _compress(raw, strategy, level), plte, alphas, icc_profile)
+
+
+def _encode_adaptive(img, strategy, icc_profile, level, box=None):
+    """PIL 的逐行自适应过滤"""
+    if box is not None:
+        img = img.crop(box)
+    return encode_png(img, compress_level=level, compress_type=STRATEGIES[strategy], icc_profile=icc_profile)
+
+
+def _chunk(chunk_type, data):
+    return (struct.pack(">I", len(data)) + chunk_type + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+
+def _container(img, bits, idat, palette=None, alphas=None, icc_profile=None):
+    width, height = img.size
+    chunks = [_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bits, _COLOR_TYPES[img.mode], 0, 0, 0))]
+    if icc_profile:
+        chunks.append(_chunk(b"iCCP", b"ICC profile\0\0" + zlib.compress(icc_profile, 9)))
+    if palette is not None:
+        chunks.append(_chunk(b"PLTE", palette))
+    if alphas:
+        chunks.append(_chunk(b"tRNS", alphas))
+    chunks.append(_chunk(b"IDAT", idat))
+    chunks.append(_chunk(b"IEND", b""))
+    return _SIGNATURE + b"".join(chunks)
+
+
+def optimize_png(img, trns=True):
+    """把图像编码为尽可能小的 PNG，返回 (字节, PngReport)；结果不会比 PIL 默认设置的编码更大
+
+    trns 为 False 时透明度只用透明通道表示，不使用带透明度表的调色板：
+    PIL 读取 ICO 中的 PNG 时会丢掉 tRNS，图像变为不透明。
+    """
+    icc_profile = img.info.get("icc_profile")
+    baseline = encode_png(img, icc_profile=icc_profile)
+    method, data = "pil", baseline
+    reduced = _reduce(img)
+    if reduced is not None and _raw_size(reduced) <= OPTIMIZE_MAX_BYTES:
+        name, candidate = _search(reduced, icc_profile, trns)
+        if len(candidate) < len(data):
+            method, data = name, candidate
+    return data, PngReport(len(data), len(baseline), method)
+
+
+def _raw_size(img):
+    return img.width * img.height * len(img.getbands())
+
+
+def _candidates(img, icc_profile, trns):
+    """全部候选编码 [(编码方式, encode(压缩级别, 区域) -> PNG 字节)]"""
+    mode = img.mode.lower()
+    candidates = []
+    for strategy in STRATEGIES:
+        candidates.append((f"{mode}/adaptive/{strategy}",
+                           functools.partial(_encode_adaptive, img, strategy, icc_profile)))
+        for kind in _FILTERS:
+            candidates.append((f"{mode}/{kind}/{strategy}",
+                               functools.partial(_encode_filtered, img, kind, strategy, icc_profile)))
+
+    # 调色板：透明度不同的同一颜色是不同的调色板项；8 位的灰度调色板与灰度图相比没有好处
+    palette = to_palette(img)
+    # 调色板按不透明度排序，第一项不透明时整个调色板都不需要 tRNS
+    if palette is not None and not trns and palette[1][0][3] != 255:
+        palette = None
+    bits = palette_bits(len(palette[1])) if palette else 8
+    if palette is not None and not (img.mode == 'L' and bits == 8):
+        indexed, entries = palette
+        # 不足 8 位时一个字节包含多个像素，只使用不过滤
+        for kind in _FILTERS if bits == 8 else ("none",):
+            for strategy in STRATEGIES:
+                candidates.append((f"p{bits}/{kind}/{strategy}",
+                                   functools.partial(_encode_indexed, indexed, bits, entries, kind, strategy,
+                                                     icc_profile)))
+    return candidates
+
+
+def _search(img, icc_profile, trns):
+    """试压全部候选，再用更高的级别重新压缩最小的几个，返回 (编码方式, 字节)
+
+    大图只试压中间的一段，最终压缩使用 6 级。
+    """
+    pool = _pool()
+    candidates = _candidates(img, icc_profile, trns)
+    box = None
+    level = 9
+    if _raw_size(img) > SEARCH_MAX_BYTES:
+        rows = max(1, TRIAL_SAMPLE_BYTES * img.height // _raw_size(img))
+        top = (img.height - rows) // 2
+        box = (0, top, img.width, top + rows)
+        level = 6
+
+    # 只保留试压中最小的结果，其余只记录大小；更高的级别偶尔反而更大，因此整幅试压的结果也参与比较
+    best = None
+    trials = []
+    encoded = pool.map(lambda candidate: candidate[1](TRIAL_LEVEL, box), candidates)
+    for (name, _), data in zip(candidates, encoded):
+        trials.append(len(data))
+        if box is None and (best is None or len(data) < len(best[1])):
+            best = (name, data)
+    finalists = sorted(range(len(candidates)), key=trials.__getitem__)[:FINALISTS]
+    results = list(pool.map(lambda index: (candidates[index][0], candidates[index][1](level)), finalists))
+    if best is not None:
+        results.append(best)
+    return min(results, key=lambda result: len(result[1]))
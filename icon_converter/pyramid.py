@@ -0,0 +1,93 @@
+"""多尺寸缩放金字塔
+
+生成图标所需的一组尺寸时，每个较小的尺寸都从已经算好的、最接近的较大层级缩放得到，
+而不是每次都从原图重新采样。大尺寸源图（例如 4096px）只需完整缩放一次。
+"""
+from PIL import Image
+
+from . import metrics
+
+# 缩放时可以直接处理的模式，其它模式（如调色板 P）先转换，避免退化为最近邻采样
+_RESIZABLE_MODES = ('RGB', 'RGBA', 'L', 'LA')
+
+
+def resizable(image):
+    """返回可以直接高质量缩放的图像，调色板等模式按是否透明转换为 RGBA 或 RGB"""
+    if image.mode in _RESIZABLE_MODES:
+        return image
+    has_alpha = 'transparency' in image.info or image.mode.endswith('A')
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def fit_size(image_size, box, upscale=False):
+    """保持宽高比缩放到 box 以内后的尺寸（与 Image.thumbnail 的结果一致）
+
+    upscale 为 True 时（矢量源），小于 box 的图像也会放大到贴合 box。
+    """
+    width, height = image_size
+    box_w, box_h = box
+    if width <= box_w and height <= box_h and not upscale:
+        return image_size
+    ratio = min(box_w / width, box_h / height)
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+class SizePyramid:
+    """按需生成并缓存各个尺寸的缩放结果
+
+    guard_size 为质量保护阈值：最长边不超过该值的尺寸直接从原图缩放，
+    避免最小的几个尺寸经过多次重采样而损失细节；为 0 时全部走链式缩放。
+    render 不为空时（矢量源），每个尺寸都调用 render((宽, 高)) 直接渲染，不做缩放。
+    """
+
+    def __init__(self, image, resample=Image.LANCZOS, guard_size=0, render=None):
+        self.image = resizable(image)
+        self.resample = resample
+        self.guard_size = guard_size
+        self.render = render
+        self.levels = {}
+
+    def _nearest_larger(self, size):
+        """已有层级中覆盖目标尺寸的最小一级，没有时返回原图"""
+        if max(size) <= self.guard_size:
+            return self.image
+        width, height = size
+        candidates = [level for level_size, level in self.levels.items()
+                      if level_size[0] >= width and level_size[1] >= height]
+        if not candidates:
+            return self.image
+        return min(candidates, key=lambda level: level.size[0] * level.size[1])
+
+    def get(self, size):
+        """返回指定尺寸的图像，必要时从最近的较大层级缩放生成"""
+        size = tuple(size)
+        if size == self.image.size:
+            return self.image
+        level = self.levels.get(size)
+        if level is None:
+            if self.render is not None:
+                level = self.render(size)
+            else:
+                with metrics.stage("resize", size[0] * size[1] * len(self.image.getbands())):
+                    level = self._nearest_larger(size).resize(size, self.resample)
+            self.levels[size] = level
+        return level
+
+    def build(self, sizes, on_level=None):
+        """按从大到小的顺序生成所有尺寸，结果按传入顺序返回
+
+        on_level 不为空时，开始前调用一次 on_level(0)，之后每生成一级调用一次 on_level(已完成的级数)；
+        它抛出的异常（例如取消）会中止生成。
+        """
+        ordered = sorted(set(map(tuple, sizes)), key=lambda s: s[0] * s[1], reverse=True)
+        if on_level is not None:
+            on_level(0)
+        for done, size in enumerate(ordered, 1):
+            self.get(size)
+            if on_level is not None:
+                on_level(done)
+        return [self.get(size) for size in sizes]
+
+    def clear(self):
+        """释放已生成的各级图像"""
+        self.levels.clear()
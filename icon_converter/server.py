@@ -0,0 +1,385 @@
+"""本地 HTTP 转换服务
+
+基于 asyncio 的最小 HTTP/1.1 服务，只用标准库，供其他工具通过 HTTP 调用转换引擎：
+
+    POST /convert?to=ico|icns|png|favicon|svg|web[&name=基本名][&mode=embed|trace&detail=medium]
+        请求体为源图像的字节，响应为转换结果；favicon、web 等多文件输出打包为 zip；
+        其余查询参数为目标格式的参数（见 engine.TARGET_OPTIONS），例如 png 的 optimize=1
+    GET /health
+        返回 JSON 格式的队列状态
+    GET /metrics
+        打开分阶段统计时，返回 Prometheus 文本格式的统计
+
+转换在进程池中执行，事件循环只负责收发数据。同时执行的转换数不超过工作进程数，
+等待中的请求超过 max_queue 时直接返回 503，由调用方稍后重试。工作进程异常退出时重建进程池，
+当时正在转换的请求返回 503。连接默认保持（keep-alive）。
+"""
+import io
+import os
+import json
+import signal
+import asyncio
+import zipfile
+import argparse
+import multiprocessing
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import UnidentifiedImageError
+
+from . import engine, metrics
+from .cli import check_svg_options, parse_colors, parse_quality
+from .trace import DETAIL_LEVELS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# 空闲连接保持的时间（秒），只用于等待下一个请求的请求行
+KEEP_ALIVE_SECONDS = 15
+# 读取请求头的时限（秒）
+HEADER_TIMEOUT_SECONDS = 15
+# 读取请求体的时限：基础时间（秒）加上按最低上传速率（字节/秒）计算的传输时间
+BODY_TIMEOUT_SECONDS = 15
+MIN_UPLOAD_RATE = 64 * 1024
+# 响应体分块写出的大小
+CHUNK_SIZE = 64 * 1024
+
+_STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+_CONTENT_TYPES = {
+    ".ico": "image/x-icon",
+    ".icns": "image/icns",
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".zip": "application/zip",
+}
+
+
+class HttpError(Exception):
+    """close 为 True 时回复后关闭连接：请求体未读取完或请求行无效时，无法确定下一个请求从哪里开始"""
+
+    def __init__(self, status, message, close=False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+
+def _init_worker(collect_metrics=False):
+    # Ctrl+C 由主进程处理，工作进程随进程池一起关闭
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if collect_metrics:
+        metrics.enable(collect=True)
+    else:
+        metrics.disable()
+
+
+def _convert_in_worker(data, target_format, base_name, guard_size, options):
+    """工作进程中的入口，连同统计记录一起返回"""
+    try:
+        return convert_bytes(data, target_format, base_name, guard_size, options), metrics.drain()
+    except Exception:
+        metrics.drain()
+        raise
+
+
+def convert_bytes(data, target_format, base_name="image", guard_size=0, options=None):
+    """转换源图像字节，返回 (文件名, 内容)；多个输出文件时返回 zip
+
+    全程在内存中完成，不写临时文件；只输出图标尺寸的目标格式按图标尺寸缩小解码。
+    """
+    try:
+        master = engine.load_source(bytes(data), guard_size,
+                                    max_size=engine.decode_size([target_format]))
+    except UnidentifiedImageError:
+        raise engine.ConversionError("无法识别的图像数据")
+    files = engine.convert_to_memory(master, target_format, base_name, options)
+    if len(files) == 1:
+        return files[0]
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+    return f"{base_name}_{target_format}.zip", buffer.getvalue()
+
+
+def _safe_name(value):
+    name = os.path.basename(value or "").strip()
+    name = os.path.splitext(name)[0]
+    return "".join(c for c in name if c.isascii() and (c.isalnum() or c in "-_.")) or "image"
+
+
+_BOOLEANS = {"1": True, "true": True, "yes": True, "on": True,
+             "0": False, "false": False, "no": False, "off": False}
+
+# 需要校验取值的参数：数值范围与命令行使用同一组校验函数，其余列出可选值
+_VALIDATORS = {
+    ("svg", "colors"): parse_colors,
+    ("svg", "quality"): parse_quality,
+}
+_CHOICES = {
+    ("svg", "mode"): engine.SVG_MODES,
+    ("svg", "codec"): tuple(engine.SVG_CODECS),
+    ("svg", "detail"): tuple(DETAIL_LEVELS),
+}
+
+
+def _target_options(target_format, query):
+    """从查询参数中取出目标格式的参数，按默认值的类型转换并按命令行的规则校验"""
+    params = {}
+    for name, default in engine.TARGET_OPTIONS.get(target_format, {}).items():
+        if name not in query:
+            continue
+        value = query[name][0]
+        key = (target_format, name)
+        try:
+            if isinstance(default, bool):
+                params[name] = _BOOLEANS[value.lower()]
+            elif key in _VALIDATORS:
+                params[name] = _VALIDATORS[key](value)
+            else:
+                params[name] = type(default)(value)
+        except argparse.ArgumentTypeError as e:
+            raise HttpError(400, f"参数 {name} 的值无效: {e}")
+        except (KeyError, ValueError):
+            raise HttpError(400, f"参数 {name} 的值无效: {value}")
+        if key in _CHOICES and params[name] not in _CHOICES[key]:
+            raise HttpError(400, f"参数 {name} 的值无效: {value}（可选: {','.join(_CHOICES[key])}）")
+    if target_format == "svg":
+        try:
+            check_svg_options(params)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+    return {target_format: params} if params else None
+
+
+class ConversionServer:
+    """HTTP 转换服务
+
+    workers 为转换进程数；max_queue 为等待中（不含正在转换）的请求数上限；
+    max_body 为请求体大小上限（字节）。host、port、max_body 为空时使用默认值。
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_queue=None,
+                 max_body=MAX_BODY_BYTES, guard_size=0):
+        self.host = host or DEFAULT_HOST
+        self.port = DEFAULT_PORT if port is None else port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.max_body = max_body or MAX_BODY_BYTES
+        self.guard_size = guard_size
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self._executor = None
+        self._slots = None
+        self._server = None
+
+    def _make_executor(self):
+        # 支持 forkserver 时由它创建工作进程：直接 fork 出的进程会继承当时打开的连接套接字，
+        # 客户端要等到工作进程退出才能读到连接关闭；进程池损坏后重建时必然已有打开的连接
+        context = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(metrics.enabled(),))
+
+    async def start(self):
+        self._executor = self._make_executor()
+        self._slots = asyncio.Semaphore(self.workers)
+        # 在接受连接之前启动工作进程，第一个请求不用等待进程启动
+        await asyncio.get_running_loop().run_in_executor(self._executor, os.getpid)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # 端口为 0 时由系统分配
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                except (asyncio.TimeoutError, ConnectionError):
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, headers, body = await self._read_request(request_line, reader, writer)
+                except asyncio.TimeoutError:
+                    payload = json.dumps({"error": "读取请求超时"}, ensure_ascii=False).encode('utf-8')
+                    await self._write_response(writer, 408, "application/json", payload, None, False)
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, content_type, filename, payload = await self._dispatch(method, target, body)
+                except HttpError as e:
+                    status, content_type, filename = e.status, "application/json", None
+                    payload = json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8')
+                    keep_alive = keep_alive and not e.close
+                await self._write_response(writer, status, content_type, payload, filename, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, request_line, reader, writer):
+        """读取请求行之后的请求头和请求体，超时抛出 asyncio.TimeoutError"""
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            return None, None, {}, HttpError(400, "无效的请求行", close=True)
+
+        headers = await asyncio.wait_for(self._read_headers(reader), HEADER_TIMEOUT_SECONDS)
+
+        body = b""
+        if method == "POST":
+            length = headers.get("content-length")
+            if length is None or not length.isdigit():
+                return method, target, headers, HttpError(411, "需要 Content-Length", close=True)
+            if int(length) > self.max_body:
+                return method, target, headers, HttpError(413, "请求体过大", close=True)
+            if headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                await writer.drain()
+            length = int(length)
+            body = await asyncio.wait_for(reader.readexactly(length),
+                                          BODY_TIMEOUT_SECONDS + length / MIN_UPLOAD_RATE)
+        return method, target, headers, body
+
+    @staticmethod
+    async def _read_headers(reader):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _dispatch(self, method, target, body):
+        if isinstance(body, HttpError):
+            raise body
+        url = urlsplit(target)
+        if url.path == "/health":
+            status = {"active": self.active, "waiting": self.waiting, "completed": self.completed,
+                      "workers": self.workers, "max_queue": self.max_queue}
+            return 200, "application/json", None, json.dumps(status).encode('utf-8')
+        if url.path == "/metrics":
+            if not metrics.enabled():
+                raise HttpError(404, "未打开分阶段统计")
+            return 200, "text/plain; version=0.0.4", None, metrics.recorder().prometheus().encode('utf-8')
+        if url.path != "/convert":
+            raise HttpError(404, "未知路径")
+        if method != "POST":
+            raise HttpError(405, "请使用 POST")
+
+        query = parse_qs(url.query)
+        target_format = query.get("to", [""])[0].lower()
+        if target_format not in engine.TARGET_FORMATS:
+            raise HttpError(400, f"不支持的目标格式: {target_format}"
+                                 f"（可选: {','.join(engine.TARGET_FORMATS)}）")
+        if not body:
+            raise HttpError(400, "请求体为空")
+        base_name = _safe_name(query.get("name", [""])[0])
+        options = _target_options(target_format, query)
+
+        filename, payload = await self._convert(body, target_format, base_name, options)
+        content_type = _CONTENT_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream")
+        return 200, content_type, filename, payload
+
+    async def _convert(self, body, target_format, base_name, options):
+        # 等待的请求过多时直接拒绝，避免排队过长占满内存
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise HttpError(503, "服务繁忙，请稍后重试")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        executor = self._executor
+        try:
+            loop = asyncio.get_running_loop()
+            result, records = await loop.run_in_executor(executor, _convert_in_worker, body,
+                                                         target_format, base_name, self.guard_size,
+                                                         options)
+            metrics.add(records)
+            return result
+        except BrokenProcessPool:
+            # 工作进程异常退出（内存不足被终止、解码器崩溃等）后整个进程池都不能再用，换一个新的；
+            # 同时失败的其他请求不再重复替换。引起崩溃的可能正是这个请求，因此不重试
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._make_executor()
+            raise HttpError(503, "转换进程异常退出，请稍后重试")
+        except engine.ConversionError as e:
+            raise HttpError(422, str(e))
+        except Exception as e:
+            # PIL 无法识别的图像等
+            raise HttpError(422 if isinstance(e, (OSError, ValueError)) else 500, str(e))
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._slots.release()
+
+    async def _write_response(self, writer, status, content_type, payload, filename, keep_alive):
+        headers = [
+            f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            headers.append(f"Keep-Alive: timeout={KEEP_ALIVE_SECONDS}")
+        if status == 503:
+            headers.append("Retry-After: 1")
+        if filename:
+            headers.append(f'Content-Disposition: attachment; filename="{filename}"')
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1'))
+        # 分块写出并等待缓冲区排空，慢速客户端不会让大文件全部堆积在内存中
+        view = memoryview(payload)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            writer.write(view[offset:offset + CHUNK_SIZE])
+            await writer.drain()
+        await writer.drain()
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_queue=None,
+          max_body=MAX_BODY_BYTES, guard_size=0, on_started=None):
+    """启动服务并一直运行，直到被中断"""
+    async def main():
+        server = await ConversionServer(host, port, workers, max_queue, max_body, guard_size).start()
+        if on_started:
+            on_started(server)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    asyncio.run(main())
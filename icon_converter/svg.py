@@ -0,0 +1,181 @@
+"""SVG 栅格化
+
+使用 Qt 的 SVG 渲染器。SvgDocument 只解析一次文档，之后按需直接渲染每个目标尺寸，
+而不是渲染一次默认尺寸再用 PIL 缩放。渲染结果按 (文档哈希, 宽, 高) 缓存，
+缓存总大小有上限，按最近最少使用（LRU）淘汰。
+"""
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from . import metrics
+from .errors import ConversionError
+
+# 栅格化缓存的默认容量（字节），按 RGBA 每像素 4 字节估算
+RASTER_CACHE_BYTES = 128 * 1024 * 1024
+
+# 保存 Qt 应用实例的引用，防止被回收
+_qt_app = None
+
+
+class RasterCache:
+    """线程安全的 LRU 缓存，按图像占用的字节数限制总大小"""
+
+    def __init__(self, max_bytes=RASTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        nbytes = image.width * image.height * 4
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.width * old.height * 4
+            self._items[key] = image
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= evicted.width * evicted.height * 4
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+raster_cache = RasterCache()
+
+
+def ensure_qt_app():
+    """SVG 渲染需要 QGuiApplication，无界面进程中以 offscreen 方式创建
+
+    QGuiApplication 必须在主线程中创建，在线程池中渲染 SVG 之前应先在主线程调用一次。
+    """
+    global _qt_app
+    from PyQt5.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        _qt_app = QGuiApplication([sys.argv[0] if sys.argv else "icon_converter",
+                                   "-platform", "offscreen"])
+
+
+def qimage_to_pil(qimage):
+    """把 QImage 转换为 RGBA 模式的 PIL 图像，不经过磁盘"""
+    from PyQt5.QtGui import QImage
+    qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
+    width, height = qimage.width(), qimage.height()
+    bits = qimage.constBits()
+    bits.setsize(qimage.sizeInBytes())
+    return Image.frombuffer('RGBA', (width, height), bytes(bits), 'raw', 'RGBA',
+                            qimage.bytesPerLine(), 1)
+
+
+class SvgDocument:
+    """解析后的 SVG 文档，可以多次渲染为不同尺寸
+
+    文档在第一次缓存未命中时才解析，全部命中时不需要解析。
+    render() 返回的图像可能来自缓存并被其他调用方共享，调用方不应修改它。
+    """
+
+    def __init__(self, data, cache=raster_cache):
+        self.data = bytes(data)
+        self.digest = hashlib.sha1(self.data).hexdigest()
+        self.cache = cache
+        self._renderer = None
+
+    @property
+    def renderer(self):
+        if self._renderer is None:
+            ensure_qt_app()
+            from PyQt5.QtCore import QByteArray
+            from PyQt5.QtSvg import QSvgRenderer
+
+            renderer = QSvgRenderer(QByteArray(self.data))
+            if not renderer.isValid():
+                raise ConversionError("无法解析SVG文件")
+            self._renderer = renderer
+        return self._renderer
+
+    @classmethod
+    def load(cls, svg_source, cache=raster_cache):
+        """从路径或字节创建文档"""
+        if isinstance(svg_source, (bytes, bytearray)):
+            return cls(svg_source, cache)
+        with open(svg_source, 'rb') as f:
+            return cls(f.read(), cache)
+
+    @property
+    def default_size(self):
+        size = self.renderer.defaultSize()
+        return size.width(), size.height()
+
+    def render_qimage(self, width=None, height=None):
+        """渲染为 QImage，未指定尺寸时使用 SVG 的默认大小"""
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QImage, QPainter
+
+        # 如果指定了尺寸，则使用指定的尺寸
+        if not (width and height):
+            width, height = self.default_size
+
+        # 创建图像
+        image = QImage(width, height, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+
+        # 渲染 SVG
+        painter = QPainter(image)
+        self.renderer.render(painter)
+        painter.end()
+
+        return image
+
+    def render(self, width=None, height=None):
+        """渲染为 PIL 图像，结果按 (文档哈希, 宽, 高) 缓存；默认尺寸以 (文档哈希, None, None) 为键"""
+        key = (self.digest, width, height) if width and height else (self.digest, None, None)
+        if self.cache is not None:
+            image = self.cache.get(key)
+            if image is not None:
+                return image
+
+        with metrics.stage("svg_render") as stage:
+            image = qimage_to_pil(self.render_qimage(width, height))
+            stage.add_bytes(image.width * image.height * 4)
+        if self.cache is not None:
+            self.cache.put(key, image)
+        return image
+
+    def render_size(self, size):
+        """按 (宽, 高) 元组渲染，供尺寸金字塔使用"""
+        return self.render(*size)
+
+
+def render_svg(svg_source, width=None, height=None):
+    """使用 Qt 的 SVG 渲染器把 SVG（路径或字节）渲染为 QImage"""
+    return SvgDocument.load(svg_source, cache=None).render_qimage(width, height)
+
+
+def rasterize_svg(svg_source, width=None, height=None):
+    """把 SVG 渲染为 PIL 图像"""
+    return SvgDocument.load(svg_source).render(width, height)
+
+
+def svg_to_png(svg_source, png_path, width=None, height=None):
+    """将 SVG 转换为 PNG，使用 Qt 的 SVG 渲染器"""
+    render_svg(svg_source, width, height).save(png_path)
+    return png_path
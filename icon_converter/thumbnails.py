@@ -0,0 +1,110 @@
+"""预览缩略图
+
+用降采样解码快速生成缩略图：JPEG 通过 draft 直接按较小的尺寸解码，ICNS 选择够用的最小成员，
+SVG 直接按缩略图尺寸渲染。生成的缩略图保存在磁盘缓存中，以 (路径, 修改时间, 文件大小, 缩略图尺寸) 为键，
+同一文件再次预览时直接读取缓存。缓存的缩略图数有上限，超出时按最近使用时间淘汰。
+"""
+import os
+import hashlib
+
+from PIL import Image
+
+from . import engine
+from .backends import user_cache_dir
+from .files import atomic_write
+from .pngopt import encode_png
+from .pyramid import fit_size
+
+THUMBNAIL_CACHE_DIR = user_cache_dir("thumbnails")
+# 缓存的缩略图数上限（100px 的缩略图约 10 KB 一个）
+THUMBNAIL_CACHE_ENTRIES = 2000
+# 超出上限时淘汰到上限的这个比例，不必每生成一个缩略图就扫描一次目录
+PRUNE_RATIO = 0.9
+
+# 缓存目录 -> 本进程估计的缩略图数，第一次写入时扫描一次，之后累加
+_entry_counts = {}
+
+
+def _cache_key(path, size):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _open_icns(path, size):
+    """打开 ICNS 中不小于缩略图尺寸的最小成员，避免解码 1024px 的大图"""
+    img = engine.open_image(path)
+    candidates = [s for s in img.info.get("sizes", [])
+                  if s[0] * s[2] >= size[0] and s[1] * s[2] >= size[1]]
+    if candidates:
+        best = min(candidates, key=lambda s: s[0] * s[2])
+        img.best_size = best
+        img.size = (best[0] * best[2], best[1] * best[2])
+    return img
+
+
+def make_thumbnail(path, size):
+    """生成不超过 size 的 PIL 缩略图"""
+    if engine.is_svg(path):
+        document = engine.SvgDocument.load(path)
+        return document.render(*fit_size(document.default_size, size, upscale=True))
+
+    if engine.is_icns(path):
+        img = _open_icns(path, size)
+    else:
+        img = engine.open_image(path)
+    # thumbnail 会先用 draft 让 JPEG 按接近目标两倍的尺寸解码，
+    # 其他格式用 reduce 做整数倍缩小，最后再做高质量缩放
+    img.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+    return img
+
+
+def _cached_files(cache_dir):
+    """返回 [(最近使用时间, 路径)]"""
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".png"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    return files
+
+
+def prune(cache_dir=THUMBNAIL_CACHE_DIR, max_entries=THUMBNAIL_CACHE_ENTRIES):
+    """缩略图数超过上限时，从最久未使用的开始删除到上限的 PRUNE_RATIO"""
+    files = _cached_files(cache_dir)
+    if len(files) > max_entries:
+        keep = int(max_entries * PRUNE_RATIO)
+        for _, path in sorted(files)[:len(files) - keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        files = files[:keep]
+    _entry_counts[cache_dir] = len(files)
+
+
+def get_thumbnail(path, size=(100, 100), cache_dir=THUMBNAIL_CACHE_DIR,
+                  max_entries=THUMBNAIL_CACHE_ENTRIES):
+    """返回缩略图 PNG 的路径，命中缓存时不解码源文件"""
+    cache_file = os.path.join(cache_dir, f"{_cache_key(path, size)}.png")
+    if os.path.exists(cache_file):
+        try:
+            # 更新修改时间，作为淘汰的依据
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return cache_file
+
+    atomic_write(cache_file, encode_png(make_thumbnail(path, size)))
+    count = _entry_counts.get(cache_dir)
+    if count is None:
+        # 扫描结果已经包含刚写入的缩略图
+        count = len(_cached_files(cache_dir))
+    else:
+        count += 1
+    _entry_counts[cache_dir] = count
+    if count > max_entries:
+        prune(cache_dir, max_entries)
+    return cache_file
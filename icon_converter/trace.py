@@ -0,0 +1,344 @@
+"""位图描摹（矢量化）
+
+把扁平风格的图标位图转换为由路径组成的 SVG，步骤如下：
+
+1. 颜色量化：不透明的像素用 PIL 量化为少量颜色，不透明度低于一半的像素视为透明；
+   抗锯齿边缘上的过渡色（位于两个面积更大的颜色之间的颜色）以及占比很小的颜色并入相邻的主要颜色，
+   避免沿边缘产生细碎的色带；
+2. 轮廓提取：用 NumPy 一次找出区域边界上的全部像素边，并合并为水平、垂直线段，再首尾相连成闭合轮廓；
+3. 路径简化：斜边上的短台阶取中点，再用 Douglas-Peucker 算法去掉多余的点；
+4. 曲线拟合：转角平缓的顶点拟合为二次贝塞尔曲线，转角尖锐的保留为折线。
+
+各颜色按面积从大到小逐层绘制，每一层的区域都延伸到画在它上面的不透明颜色之下，
+因此相邻颜色之间不会因为两侧的轮廓各自简化而露出缝隙。半透明的颜色按平均不透明度输出。
+
+需要 NumPy，没有安装时抛出 ConversionError。
+"""
+import itertools
+from collections import namedtuple
+
+from PIL import Image
+
+from .errors import ConversionError
+from .pyramid import fit_size, resizable
+
+# colors 为量化的颜色数；tolerance 为简化容差（像素）；min_area 为忽略的最小面积（像素²）；
+# min_share 为颜色至少占不透明像素的比例，不足的并入最接近的颜色；max_size 为描摹时的最大尺寸
+DetailLevel = namedtuple('DetailLevel', ['colors', 'tolerance', 'min_area', 'min_share', 'max_size'])
+
+DETAIL_LEVELS = {
+    "low": DetailLevel(8, 1.0, 16, 0.02, 256),
+    "medium": DetailLevel(16, 0.6, 4, 0.005, 512),
+    "high": DetailLevel(32, 0.4, 3, 0.002, 1024),
+}
+
+# 转角大于该角度（度）的顶点保留为尖角，否则拟合为曲线
+CORNER_ANGLE = 60
+
+# 不超过该长度（像素）的线段视为斜边上的台阶，只取中点
+STEP_LENGTH = 2
+
+# 不透明度低于该值的像素视为透明
+ALPHA_THRESHOLD = 128
+
+# 颜色数上限，判断过渡色时需要比较全部的颜色三元组
+MAX_COLORS = 64
+
+# 与两个颜色连线的距离（RGB）在该值以内的颜色视为二者之间的过渡色
+BLEND_TOLERANCE = 16
+
+# 与像素更多的颜色距离（RGB）在该值以内的颜色视为同一颜色
+SIMILAR_DISTANCE = 16
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ConversionError("描摹位图需要安装 NumPy（pip install numpy）")
+    return numpy
+
+
+def _quantize(np, img, colors, min_share):
+    """返回 (每个像素的颜色编号，透明为 -1, 调色板数组 (n, 3), 各颜色的平均不透明度 (n,))"""
+    rgba = np.asarray(img.convert('RGBA'))
+    alpha = rgba[..., 3]
+    opaque = alpha >= ALPHA_THRESHOLD
+    labels = np.full(opaque.shape, -1, dtype=np.int32)
+    pixels = rgba[opaque][:, :3]
+    if not len(pixels):
+        return labels, np.zeros((0, 3), dtype=np.uint8), np.zeros(0)
+
+    # 只量化不透明的像素，透明区域的颜色不会占用调色板
+    row = Image.fromarray(np.ascontiguousarray(pixels[np.newaxis]), 'RGB')
+    quantized = row.quantize(colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    indices = np.asarray(quantized)[0].astype(np.int32)
+    palette = np.array(quantized.getpalette()[:3 * colors], dtype=np.uint8).reshape(-1, 3)
+    palette = palette[:max(1, indices.max() + 1)]
+
+    # 先合并几乎相同的颜色，再把过渡色并入相邻的颜色，最后把占比过小的颜色并入调色板中最接近的主要颜色
+    counts = np.bincount(indices, minlength=len(palette))
+    indices = _merge_similar(np, palette, counts)[indices]
+    counts = np.bincount(indices, minlength=len(palette))
+    indices = _merge_blends(np, palette, counts)[indices]
+    counts = np.bincount(indices, minlength=len(palette))
+    major = np.nonzero(counts >= min_share * len(indices))[0]
+    if not len(major):
+        major = np.array([int(np.argmax(counts))])
+    distances = ((palette[:, np.newaxis, :].astype(np.int32) - palette[major]) ** 2).sum(axis=2)
+    indices = major[np.argmin(distances, axis=1)][indices]
+
+    labels[opaque] = indices
+    counts = np.bincount(indices, minlength=len(palette))
+    opacity = np.bincount(indices, weights=alpha[opaque], minlength=len(palette))
+    opacity = opacity / np.maximum(counts, 1) / 255
+    return labels, palette, opacity
+
+
+def _merge_similar(np, palette, counts):
+    """返回各颜色合并后的编号：与像素更多的颜色足够接近的颜色并入其中最接近的一个"""
+    colors = palette.astype(np.int32)
+    distance = ((colors[:, np.newaxis, :] - colors[np.newaxis, :, :]) ** 2).sum(axis=2)
+    larger = counts[np.newaxis, :] > counts[:, np.newaxis]
+    distance = np.where(larger & (distance <= SIMILAR_DISTANCE ** 2), distance, np.iinfo(np.int32).max)
+    target = np.where(larger.any(axis=1) & (distance.min(axis=1) <= SIMILAR_DISTANCE ** 2),
+                      np.argmin(distance, axis=1), np.arange(len(colors)))
+    return _resolve(np, target)
+
+
+def _resolve(np, target):
+    """合并的目标本身也可能被合并，沿着编号一直找到最终的颜色"""
+    while True:
+        resolved = target[target]
+        if np.array_equal(resolved, target):
+            return target
+        target = resolved
+
+
+def _merge_blends(np, palette, counts):
+    """返回各颜色合并后的编号：位于两个像素更多的颜色 a、b 连线上的颜色 c 并入 a、b 中较近的一个"""
+    colors = palette.astype(np.float64)
+    # 下标依次为 [a, b, c]
+    ab = colors[np.newaxis, :, np.newaxis, :] - colors[:, np.newaxis, np.newaxis, :]
+    ac = colors[np.newaxis, np.newaxis, :, :] - colors[:, np.newaxis, np.newaxis, :]
+    t = (ab * ac).sum(axis=3) / np.maximum((ab ** 2).sum(axis=3), 1)
+    distance = ((ac - t[..., np.newaxis] * ab) ** 2).sum(axis=3)
+    larger = counts[:, np.newaxis] > counts[np.newaxis, :]
+    blend = ((t > 0.1) & (t < 0.9) & (distance < BLEND_TOLERANCE ** 2)
+             & larger[:, np.newaxis, :] & larger[np.newaxis, :, :])
+    distance = np.where(blend, distance, np.inf).reshape(-1, len(colors))
+
+    target = np.arange(len(colors))
+    merged = np.nonzero(np.isfinite(distance).any(axis=0))[0]
+    best = np.argmin(distance[:, merged], axis=0)
+    a, b = np.divmod(best, len(colors))
+    target[merged] = np.where(t[a, b, merged] < 0.5, a, b)
+    return _resolve(np, target)
+
+
+def _runs(np, edges):
+    """每行中连续为 True 的区间，返回 (行号, 起点, 终点)，终点不含在内"""
+    padded = np.zeros((edges.shape[0], edges.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = edges
+    steps = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
+    return rows, starts, ends
+
+
+def _segments(np, mask):
+    """区域边界上的线段，返回 (n, 4) 数组 x0, y0, x1, y1
+
+    坐标为像素格点，线段沿顺时针方向（图像坐标，y 向下），区域始终在行进方向的右侧。
+    同一行（列）中相连的像素边合并为一条线段，线段的端点就是轮廓的拐角。
+    """
+    m = np.pad(mask, 1)
+    above, below = m[:-1, 1:-1], m[1:, 1:-1]
+    left, right = m[1:-1, :-1], m[1:-1, 1:]
+
+    parts = []
+    # 像素的上边：从左到右
+    y, x0, x1 = _runs(np, below & ~above)
+    parts.append(np.stack([x0, y, x1, y], axis=1))
+    # 像素的下边：从右到左
+    y, x0, x1 = _runs(np, above & ~below)
+    parts.append(np.stack([x1, y, x0, y], axis=1))
+    # 像素的左边：从下到上
+    x, y0, y1 = _runs(np, (right & ~left).T)
+    parts.append(np.stack([x, y1, x, y0], axis=1))
+    # 像素的右边：从上到下
+    x, y0, y1 = _runs(np, (left & ~right).T)
+    parts.append(np.stack([x, y0, x, y1], axis=1))
+    return np.concatenate(parts)
+
+
+def _loops(np, segments, width):
+    """把线段首尾相连，返回各闭合轮廓的线段编号列表"""
+    stride = width + 1
+    starts = segments[:, 1] * stride + segments[:, 0]
+    ends = segments[:, 3] * stride + segments[:, 2]
+    order = np.argsort(starts, kind='stable')
+    sorted_starts = starts[order]
+    first = np.searchsorted(sorted_starts, ends)
+    count = np.searchsorted(sorted_starts, ends, side='right') - first
+    following = order[first]
+
+    # 两个区域只在对角处相接时，同一格点上有两条出发的线段，选择向右转的一条（贴着区域走），
+    # 对角相接的区域成为各自独立的轮廓
+    saddle = np.nonzero(count == 2)[0]
+    if len(saddle):
+        incoming = segments[saddle, 2:] - segments[saddle, :2]
+        candidate = following[saddle]
+        outgoing = segments[candidate, 2:] - segments[candidate, :2]
+        right_turn = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0] > 0
+        following[saddle] = np.where(right_turn, candidate, order[first[saddle] + 1])
+
+    following = following.tolist()
+    visited = bytearray(len(following))
+    loops = []
+    for start in range(len(following)):
+        if visited[start]:
+            continue
+        loop = []
+        index = start
+        while not visited[index]:
+            visited[index] = 1
+            loop.append(index)
+            index = following[index]
+        loops.append(loop)
+    return loops
+
+
+def _outline(np, segments):
+    """轮廓上的点：短的台阶取中点，较长的线段保留两端的拐角"""
+    start, end = segments[:, :2].astype(np.float64), segments[:, 2:].astype(np.float64)
+    unit = np.abs(end - start).sum(axis=1) <= STEP_LENGTH
+    first = np.where(unit[:, np.newaxis], (start + end) / 2, start)
+    points = np.stack([first, end], axis=1).reshape(-1, 2)
+    valid = np.stack([np.ones_like(unit), ~unit], axis=1).reshape(-1)
+    points = points[valid]
+    # 相邻的长线段共用拐角，去掉重复的点
+    distinct = np.any(points != np.roll(points, 1, axis=0), axis=1)
+    return points[distinct]
+
+
+def _simplify(np, points, tolerance):
+    """闭合折线的 Douglas-Peucker 简化"""
+    count = len(points)
+    if count <= 4:
+        return points
+    closed = np.vstack([points, points[:1]])
+    # 从离起点最远的点处分为两段，各自简化
+    far = int(np.argmax(((points - points[0]) ** 2).sum(axis=1)))
+    keep = np.zeros(count + 1, dtype=bool)
+    keep[[0, far, count]] = True
+    stack = [(0, far), (far, count)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        p, direction = closed[a], closed[b] - closed[a]
+        offsets = closed[a + 1:b] - p
+        length = np.hypot(*direction)
+        if length:
+            distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            middle = a + 1 + index
+            keep[middle] = True
+            stack.append((a, middle))
+            stack.append((middle, b))
+    return closed[keep][:-1]
+
+
+def _number(value):
+    return f"{round(value, 2):g}"
+
+
+def _path_data(np, points):
+    """把简化后的多边形转换为路径数据：平缓的顶点用二次贝塞尔曲线经过各边中点"""
+    following = np.roll(points, -1, axis=0)
+    incoming = points - np.roll(points, 1, axis=0)
+    outgoing = following - points
+    norms = np.hypot(incoming[:, 0], incoming[:, 1]) * np.hypot(outgoing[:, 0], outgoing[:, 1])
+    cosines = (incoming * outgoing).sum(axis=1) / np.where(norms == 0, 1, norms)
+    sharp = cosines < np.cos(np.radians(CORNER_ANGLE))
+    middles = (points + following) / 2
+
+    x, y = middles[-1]
+    commands = [f"M{_number(x)} {_number(y)}"]
+    for (px, py), (mx, my), corner in zip(points.tolist(), middles.tolist(), sharp.tolist()):
+        if corner:
+            commands.append(f"L{_number(px)} {_number(py)} {_number(mx)} {_number(my)}")
+        else:
+            commands.append(f"Q{_number(px)} {_number(py)} {_number(mx)} {_number(my)}")
+    commands.append("Z")
+    return "".join(commands)
+
+
+def trace_image(img, detail="medium", colors=0, cancel=None):
+    """把位图描摹为 SVG 文档（字节）
+
+    detail 为细节级别（low、medium、high），决定颜色数、简化容差、忽略的小色块以及描摹时的最大尺寸；
+    colors 大于 0 时代替细节级别的颜色数；cancel 为可选的 CancelToken，在各颜色层之间检查。
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ConversionError(f"不支持的细节级别: {detail}（可选: {','.join(DETAIL_LEVELS)}）")
+    np = _numpy()
+    level = DETAIL_LEVELS[detail]
+    colors = min(MAX_COLORS, colors or level.colors)
+
+    width, height = img.size
+    trace_size = fit_size(img.size, (level.max_size, level.max_size))
+    if trace_size != img.size:
+        img = resizable(img).resize(trace_size, Image.LANCZOS)
+    labels, palette, opacity = _quantize(np, img, colors, level.min_share)
+
+    # 按面积从大到小排列颜色，像素的层号为它的颜色所在的层，透明为 -1
+    counts = np.bincount(labels[labels >= 0], minlength=len(palette))
+    layers = [int(c) for c in np.argsort(-counts, kind='stable') if counts[c]]
+    # 多出的最后一项对应透明像素的编号 -1
+    rank = np.full(len(palette) + 1, -1, dtype=np.int32)
+    rank[layers] = np.arange(len(layers))
+    pixel_layers = rank[labels]
+    # 下层只延伸到不透明的上层之下，半透明的上层下面不能透出其他颜色
+    solid = np.append(opacity >= 0.99, False)[labels]
+
+    paths = []
+    for index, color in enumerate(layers):
+        if cancel is not None:
+            cancel.check()
+        mask = (pixel_layers == index) | ((pixel_layers > index) & solid)
+        segments = _segments(np, mask)
+        loops = _loops(np, segments, trace_size[0])
+
+        # 先按线段算出各轮廓的面积，跳过小色块，不再逐个处理
+        flat = segments[list(itertools.chain.from_iterable(loops))]
+        cross = flat[:, 0] * flat[:, 3] - flat[:, 2] * flat[:, 1]
+        offsets = np.cumsum([0] + [len(loop) for loop in loops[:-1]])
+        areas = np.abs(np.add.reduceat(cross, offsets)) / 2
+
+        subpaths = []
+        for loop in (loops[i] for i in np.nonzero(areas >= level.min_area)[0]):
+            points = _simplify(np, _outline(np, segments[loop]), level.tolerance)
+            if len(points) >= 3:
+                subpaths.append(_path_data(np, points))
+        if subpaths:
+            r, g, b = palette[color].tolist()
+            fill = f'fill="#{r:02x}{g:02x}{b:02x}"'
+            if opacity[color] < 0.99:
+                fill += f' fill-opacity="{opacity[color]:.2f}"'
+            paths.append(f'<path {fill} d="{"".join(subpaths)}"/>')
+
+    view_width, view_height = trace_size
+    document = "\n".join([
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+        f'<svg width="{width}" height="{height}" viewBox="0 0 {view_width} {view_height}" '
+        f'xmlns="http://www.w3.org/2000/svg">',
+        *paths,
+        '</svg>',
+        '',
+    ])
+    return document.encode('utf-8')
@@ -0,0 +1,273 @@
+"""监视文件夹模式
+
+常驻运行，监视源目录中新增或修改的图片并自动转换。Linux 上使用 inotify，其他平台定期扫描目录。
+连续的写入事件会先去抖：源目录安静 debounce 秒后，才把积累的文件作为一批交给线程池转换。
+
+转换在同一进程的线程池中执行，解码后的源（按路径、修改时间和大小，见 engine.SourceCache）
+和 SVG 栅格化缓存在各批之间一直保留。增量清单先于这些缓存判断，未改动且输出齐全的文件直接跳过；
+解码缓存只在清单认为需要转换、而文件本身未改动时命中，例如上次有目标格式转换失败，
+或输出被删除后源文件被移出又移回（修改时间不变），这时不必再次解码。
+源文件内容改动后修改时间随之变化，仍然需要重新解码。
+输出目录中维护增量清单（见 manifest 模块），内容没有变化的文件不会重复转换，
+源文件被删除时它的输出也会被删除。
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+
+from . import batch, engine
+from .manifest import BuildManifest
+from .svg import ensure_qt_app
+
+# 目录安静多久后开始转换（秒）
+DEBOUNCE_SECONDS = 0.5
+# 轮询模式的扫描间隔（秒）
+POLL_INTERVAL = 1.0
+
+# inotify 事件掩码，见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _scan(root, exclude=None):
+    """返回目录树中全部源文件的 {路径: (修改时间, 大小)}"""
+    snapshot = {}
+    for folder, dirs, files in os.walk(root):
+        if exclude:
+            dirs[:] = [d for d in dirs if os.path.join(folder, d) != exclude]
+        for name in files:
+            if batch.is_source_file(name):
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class PollingWatcher:
+    """定期扫描目录树，通过比较修改时间和大小发现变化"""
+
+    def __init__(self, root, interval=POLL_INTERVAL, exclude=None):
+        self.root = root
+        self.interval = interval
+        self.exclude = exclude
+        self._snapshot = _scan(root, exclude)
+
+    def read(self, timeout):
+        """等待最多 timeout 秒，返回有变化（新增、修改或删除）的路径集合"""
+        time.sleep(min(timeout, self.interval))
+        snapshot = _scan(self.root, self.exclude)
+        changed = {path for path, state in snapshot.items() if self._snapshot.get(path) != state}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """基于 Linux inotify 的监视器，递归监视整个目录树，新建的子目录会自动加入"""
+
+    def __init__(self, root, exclude=None):
+        self.root = root
+        self.exclude = exclude
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_watch(self, folder):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify 监视数量已达上限（fs.inotify.max_user_watches）")
+            # 目录在加入前已被删除
+            return
+        self._dirs[wd] = folder
+
+    def _add_tree(self, root):
+        """监视 root 及其全部子目录，返回其中已有的源文件"""
+        found = set()
+        for folder, dirs, files in os.walk(root):
+            if self.exclude:
+                dirs[:] = [d for d in dirs if os.path.join(folder, d) != self.exclude]
+            self._add_watch(folder)
+            found.update(os.path.join(folder, name) for name in files if batch.is_source_file(name))
+        return found
+
+    def read(self, timeout):
+        """等待最多 timeout 秒，返回有变化（新增、修改或删除）的路径集合"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，丢失了部分事件，重新扫描整个目录树
+                changed.update(_scan(self.root, self.exclude))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            folder = self._dirs.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path != self.exclude:
+                    # 新目录中可能已经有文件，加入监视时一并报告
+                    changed.update(self._add_tree(path))
+                elif mask & IN_MOVED_FROM:
+                    # 目录被移走，其中的文件不会再有单独的事件
+                    changed.add(path)
+            elif batch.is_source_file(name):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(root, poll=False, interval=POLL_INTERVAL, exclude=None):
+    """Linux 上优先使用 inotify，不可用时退回轮询"""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, exclude)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, interval, exclude)
+
+
+class WatchService:
+    """监视源目录并把变化的文件转换到输出目录，保持源目录的相对结构
+
+    options 为各目标格式的参数 {目标格式: {参数: 值}}；debounce 为空时使用 DEBOUNCE_SECONDS；poll 为 True 时总是使用轮询；on_result 在每个文件转换完成后以 FileResult 调用；
+    on_removed 在删除过期输出后以文件列表调用。
+    """
+
+    def __init__(self, source_root, output_folder, targets, workers=None, guard_size=0,
+                 cache=None, debounce=None, poll=False, on_result=None,
+                 on_removed=None, options=None):
+        self.source_root = source_root
+        self.output_folder = output_folder
+        self.targets = targets
+        self.guard_size = guard_size
+        self.cache = cache
+        self.options = options
+        self.debounce = DEBOUNCE_SECONDS if debounce is None else debounce
+        self.on_result = on_result
+        self.on_removed = on_removed
+        self.cancel = engine.CancelToken()
+        self.manifest = BuildManifest(source_root, output_folder)
+        self.watcher = make_watcher(source_root, poll=poll, exclude=self._excluded_folder())
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.sources = engine.SourceCache()
+
+    def _excluded_folder(self):
+        # 输出目录位于源目录中时不监视它，否则生成的 PNG 会被当作新的源文件
+        output = os.path.abspath(self.output_folder)
+        root = os.path.abspath(self.source_root)
+        if output.startswith(root + os.sep):
+            return os.path.join(self.source_root, os.path.relpath(output, root))
+        return None
+
+    def _output_dir(self, source):
+        rel_dir = os.path.relpath(os.path.dirname(source), self.source_root)
+        return self.output_folder if rel_dir == os.curdir else os.path.join(self.output_folder, rel_dir)
+
+    def sync(self):
+        """启动时按清单转换离线期间有变化的文件，并删除已删除源文件的输出"""
+        exclude = self._excluded_folder()
+        sources = sorted(_scan(self.source_root, exclude))
+        removed = self.manifest.remove_orphans(sources)
+        if removed and self.on_removed:
+            self.on_removed(removed)
+        self.convert(sources)
+
+    def convert(self, paths):
+        """转换一批文件：已删除的文件删除其输出，内容没有变化的文件跳过"""
+        if any(not os.path.isfile(p) for p in paths):
+            removed = self.manifest.remove_missing()
+            if removed and self.on_removed:
+                self.on_removed(removed)
+
+        jobs = [(p, self._output_dir(p)) for p in sorted(paths) if os.path.isfile(p)]
+        jobs, _ = self.manifest.plan(jobs, self.targets, self.guard_size, self.options)
+        if any(engine.is_svg(source) for source, _ in jobs):
+            ensure_qt_app()
+        futures = [self.executor.submit(batch.convert_file, source, self.targets, output_dir,
+                                        self.guard_size, self.cancel, self.cache, self.options,
+                                        self.sources)
+                   for source, output_dir in jobs]
+        results = [future.result() for future in futures]
+        for result in results:
+            if result.outputs and os.path.isfile(result.source):
+                self.manifest.record(result.source, result.outputs, self.guard_size, self.options)
+            if self.on_result:
+                self.on_result(result)
+        self.manifest.save()
+        return results
+
+    def run(self):
+        """持续监视直到 stop() 被调用"""
+        self.sync()
+        pending = set()
+        last_event = 0.0
+        while not self.cancel.cancelled:
+            timeout = self.debounce if pending else POLL_INTERVAL
+            changed = self.watcher.read(timeout)
+            if changed:
+                pending.update(changed)
+                last_event = time.monotonic()
+            elif pending and time.monotonic() - last_event >= self.debounce:
+                # 一段时间内没有新的写入，把积累的文件作为一批转换
+                paths, pending = pending, set()
+                self.convert(paths)
+
+    def stop(self):
+        """停止监视；正在转换的文件在下一个尺寸处停止"""
+        self.cancel.cancel()
+
+    def close(self):
+        self.watcher.close()
+        self.executor.shutdown(wait=True)
+        self.sources.clear()
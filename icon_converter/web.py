@@ -0,0 +1,104 @@
+"""网页图标包（web 目标格式）的文件清单、manifest.webmanifest 和 HTML 片段
+
+一次转换写出网页前端需要的全部图标文件：
+    favicon.ico                     16/32/48 像素
+    favicon-16x16.png、favicon-32x32.png
+    apple-touch-icon.png            180 像素，另有 167/152/120 像素；iOS 不支持透明，铺满背景色
+    icon-192x192.png、icon-512x512.png   Android/PWA 图标，保留透明
+    icon-maskable-512x512.png       可遮罩图标，图像缩小到安全区以内并铺满背景色
+    manifest.webmanifest            引用 Android/PWA 图标
+    head.html                       放进页面 <head> 的 link/meta 标签
+
+文件名前加上“<基本名>_web_”，与其他目标格式的输出放在同一目录中也不会冲突。
+只有常量和文本生成，不导入 PIL。
+"""
+import json
+from collections import namedtuple
+from html import escape
+
+# favicon.ico 中的尺寸
+ICO_SIZES = [(16, 16), (32, 32), (48, 48)]
+
+# 可遮罩图标的安全区：图像只占边长的这个比例（规范中的安全区为直径 80% 的圆）
+MASKABLE_SAFE_ZONE = 0.8
+
+# 一个 PNG 图标：文件名、边长、用途
+#   favicon   浏览器标签页，保留透明
+#   apple     apple-touch-icon，铺满背景色
+#   any       Android/PWA 图标，保留透明
+#   maskable  可遮罩图标，缩小到安全区以内并铺满背景色
+WebIcon = namedtuple('WebIcon', ['name', 'size', 'purpose'])
+
+ICONS = [
+    WebIcon("favicon-16x16.png", 16, "favicon"),
+    WebIcon("favicon-32x32.png", 32, "favicon"),
+    WebIcon("apple-touch-icon.png", 180, "apple"),
+    WebIcon("apple-touch-icon-167x167.png", 167, "apple"),
+    WebIcon("apple-touch-icon-152x152.png", 152, "apple"),
+    WebIcon("apple-touch-icon-120x120.png", 120, "apple"),
+    WebIcon("icon-192x192.png", 192, "any"),
+    WebIcon("icon-512x512.png", 512, "any"),
+    WebIcon("icon-maskable-512x512.png", 512, "maskable"),
+]
+
+ICO_NAME = "favicon.ico"
+MANIFEST_NAME = "manifest.webmanifest"
+HTML_NAME = "head.html"
+
+
+def file_name(base_name, name):
+    """图标包中的文件在输出目录中的文件名"""
+    return f"{base_name}_web_{name}"
+
+
+def file_names(base_name):
+    """图标包的全部文件名，第一个为主输出文件"""
+    names = [ICO_NAME] + [icon.name for icon in ICONS] + [MANIFEST_NAME, HTML_NAME]
+    return [file_name(base_name, name) for name in names]
+
+
+def url(path, base_name, name):
+    """图标的 URL；path 为图标所在的 URL 路径前缀，例如 "/" 或 "/static"，为空时使用相对路径"""
+    if path and not path.endswith("/"):
+        path += "/"
+    return path + file_name(base_name, name)
+
+
+def manifest(base_name, app_name, theme_color, background, path):
+    """manifest.webmanifest 的内容"""
+    icons = []
+    for icon in ICONS:
+        if icon.purpose not in ("any", "maskable"):
+            continue
+        entry = {"src": url(path, base_name, icon.name),
+                 "sizes": f"{icon.size}x{icon.size}", "type": "image/png"}
+        if icon.purpose == "maskable":
+            entry["purpose"] = "maskable"
+        icons.append(entry)
+    document = {
+        "name": app_name or base_name,
+        "short_name": app_name or base_name,
+        "icons": icons,
+        "theme_color": theme_color,
+        "background_color": background,
+        "display": "standalone",
+    }
+    return json.dumps(document, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def head_html(base_name, theme_color, path, ico_sizes):
+    """引用图标包的 HTML 片段，ico_sizes 为 favicon.ico 中实际写入的各帧边长"""
+    def href(name):
+        return escape(url(path, base_name, name))
+
+    sizes = " ".join(f"{size}x{size}" for size in ico_sizes)
+    lines = [f'<link rel="icon" href="{href(ICO_NAME)}" sizes="{sizes}">']
+    for icon in ICONS:
+        size = f"{icon.size}x{icon.size}"
+        if icon.purpose == "favicon":
+            lines.append(f'<link rel="icon" type="image/png" sizes="{size}" href="{href(icon.name)}">')
+        elif icon.purpose == "apple":
+            lines.append(f'<link rel="apple-touch-icon" sizes="{size}" href="{href(icon.name)}">')
+    lines.append(f'<link rel="manifest" href="{href(MANIFEST_NAME)}">')
+    lines.append(f'<meta name="theme-color" content="{escape(theme_color)}">')
+    return ("\n".join(lines) + "\n").encode('utf-8')
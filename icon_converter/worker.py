@@ -0,0 +1,149 @@
+"""GUI 后台转换任务
+
+转换在 QThreadPool 的工作线程中执行，通过信号报告进度、完成和错误，界面线程不会被阻塞。
+多个文件同时提交时，各文件在线程池中并发转换（PIL 的缩放和编码会释放 GIL）。
+"""
+import os
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+
+from . import engine
+
+
+class TaskSignals(QObject):
+    # 已完成步数, 总步数
+    progress = pyqtSignal(int, int)
+    # 目标格式, 输出文件路径
+    finished = pyqtSignal(str, str)
+    # 目标格式, 错误信息
+    error = pyqtSignal(str, str)
+    # 目标格式
+    cancelled = pyqtSignal(str)
+
+
+class ConversionTask(QRunnable):
+    """在工作线程中执行一次 engine.convert
+
+    cache 为输出缓存（output_cache.OutputCache），默认不使用，每次都完整转换。
+    """
+
+    def __init__(self, source, target_format, output_folder, base_name=None, cache=None):
+        super().__init__()
+        self.source = source
+        self.target_format = target_format
+        self.output_folder = output_folder
+        self.base_name = base_name
+        self.cache = cache
+        self.cancel_token = engine.CancelToken()
+        self.signals = TaskSignals()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            output_file = engine.convert(self.source, self.target_format, self.output_folder,
+                                         self.base_name, progress=self.signals.progress.emit,
+                                         cancel=self.cancel_token, cache=self.cache)
+        except engine.ConversionCancelled:
+            self.signals.cancelled.emit(self.target_format)
+        except Exception as e:
+            self.signals.error.emit(self.target_format, str(e))
+        else:
+            self.signals.finished.emit(self.target_format, output_file)
+
+    @property
+    def source_label(self):
+        if isinstance(self.source, str):
+            return os.path.basename(self.source)
+        return engine.default_base_name(self.source)
+
+
+class ConversionBatch(QObject):
+    """一次提交的一组转换任务，汇总进度和结果
+
+    只有一个任务时转发它的逐尺寸进度，多个任务时按已完成的任务数报告进度。
+    """
+
+    # 已完成步数, 总步数
+    progress = pyqtSignal(int, int)
+    # 全部任务结束时发出，参数为批次本身
+    finished = pyqtSignal(object)
+
+    def __init__(self, target_format, tasks, parent=None):
+        super().__init__(parent)
+        self.target_format = target_format
+        self.tasks = list(tasks)
+        self.outputs = []
+        # (源文件名, 错误信息)
+        self.errors = []
+        self.cancelled = 0
+
+        for task in self.tasks:
+            task.signals.finished.connect(lambda _, output: self._task_finished(output))
+            task.signals.error.connect(lambda _, message, task=task: self._task_failed(task, message))
+            task.signals.cancelled.connect(lambda _: self._task_cancelled())
+        if len(self.tasks) == 1:
+            self.tasks[0].signals.progress.connect(self.progress)
+
+    @property
+    def done(self):
+        return len(self.outputs) + len(self.errors) + self.cancelled
+
+    def _task_finished(self, output_file):
+        self.outputs.append(output_file)
+        self._task_done()
+
+    def _task_failed(self, task, message):
+        self.errors.append((task.source_label, message))
+        self._task_done()
+
+    def _task_cancelled(self):
+        self.cancelled += 1
+        self._task_done()
+
+    def _task_done(self):
+        if len(self.tasks) > 1:
+            self.progress.emit(self.done, len(self.tasks))
+        if self.done == len(self.tasks):
+            self.finished.emit(self)
+
+
+class ConversionQueue(QObject):
+    """转换任务队列，按提交顺序开始执行，同时执行的任务数不超过 CPU 核心数"""
+
+    # 队列中（含正在执行）的任务数
+    pending_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, QThread.idealThreadCount()))
+        # 保留任务的引用直到完成，防止信号对象被提前回收
+        self._tasks = []
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    def submit(self, task):
+        self._tasks.append(task)
+        task.signals.finished.connect(lambda *_: self._task_done(task))
+        task.signals.error.connect(lambda *_: self._task_done(task))
+        task.signals.cancelled.connect(lambda *_: self._task_done(task))
+        self.pool.start(task)
+        self.pending_changed.emit(self.pending)
+
+    def submit_batch(self, batch):
+        for task in batch.tasks:
+            self.submit(task)
+
+    def cancel_all(self):
+        """取消正在执行和排队中的全部任务；排队中的任务开始时会立即结束"""
+        for task in self._tasks:
+            task.cancel()
+
+    def _task_done(self, task):
+        if task in self._tasks:
+            self._tasks.remove(task)
+        self.pending_changed.emit(self.pending)